@@ -0,0 +1,75 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from src.embedders import ParallelSentenceEmbedder
+
+
+def make_documents(n_docs:int, seed:int=0):
+    """
+    Generates synthetic article descriptions with a realistic spread of lengths (5 to 120 words).
+
+    Parameters:
+    - n_docs (int): Number of documents to generate.
+    - seed (int): Random seed.
+
+    Returns:
+    - list: List of synthetic documents.
+    """
+
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"word{i}" for i in range(5000)])
+    lengths = rng.integers(5, 120, n_docs)
+    return [" ".join(rng.choice(vocab, length)) for length in lengths]
+
+def benchmark_workers(documents:list, worker_counts:list, model_name:str='paraphrase-MiniLM-L6-v2', backend:str='torch', batch_size:int=64, threads_per_worker:int=1):
+    """
+    Measures embedding throughput for each worker count. Worker pools are started and warmed up before timing, so model
+    loading is excluded from the reported throughput. Every configuration, including the in-process single-worker
+    baseline, gets the same threads_per_worker torch threads per worker, so the efficiency column is the scaling over
+    worker processes at a fixed per-worker budget. With threads_per_worker=None each configuration instead splits all
+    cores between its workers (the embedder's default), and efficiency then compares process parallelism against torch's
+    own intra-op threading on the same cores rather than against one core.
+
+    Parameters:
+    - documents (list): Documents to embed.
+    - worker_counts (list): Worker counts to benchmark.
+    - model_name (str): Sentence-transformer model to benchmark.
+    - backend (str): Embedding backend passed to ParallelSentenceEmbedder.
+    - batch_size (int): Documents per batch.
+    - threads_per_worker (int): Torch threads per worker, or None for cpu_count // n_workers.
+
+    Returns:
+    - pd.DataFrame: Throughput (docs/s), speedup and parallel efficiency per worker count.
+    """
+
+    rows = []
+    for n_workers in worker_counts:
+        with ParallelSentenceEmbedder(model_name, n_workers=n_workers, batch_size=batch_size, backend=backend, n_threads=threads_per_worker) as embedder:
+            embedder.embed(documents[:batch_size * n_workers])  # warm up every worker
+
+            start = time.perf_counter()
+            embedder.embed(documents)
+            elapsed = time.perf_counter() - start
+
+        rows.append({'n_workers': n_workers, 'seconds': elapsed, 'docs_per_s': len(documents) / elapsed})
+        print(f"{n_workers} workers: {len(documents) / elapsed:.0f} docs/s")
+
+    results_df = pd.DataFrame(rows)
+    results_df['speedup'] = results_df['docs_per_s'] / results_df['docs_per_s'].iloc[0]
+    results_df['efficiency'] = results_df['speedup'] / (results_df['n_workers'] / results_df['n_workers'].iloc[0])
+    return results_df
+
+
+if __name__ == "__main__":
+    N_DOCS = 20000
+    MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+    BACKEND = 'torch'
+    BATCH_SIZE = 64
+    THREADS_PER_WORKER = 1  # None to split all cores between the workers
+    WORKER_COUNTS = sorted({1, 2, 4, 8, os.cpu_count()} & set(range(1, os.cpu_count() + 1)))
+
+    documents = make_documents(N_DOCS)
+    results_df = benchmark_workers(documents, WORKER_COUNTS, model_name=MODEL_NAME, backend=BACKEND, batch_size=BATCH_SIZE, threads_per_worker=THREADS_PER_WORKER)
+    print("\nembedding throughput:")
+    print(results_df.to_string(index=False))
@@ -0,0 +1,87 @@
+import os
+import re
+import time
+import html
+import unicodedata
+import numpy as np
+import pandas as pd
+from utils.normalize import normalize_text
+
+# fragments that exercise every normalisation step: entities (including escaped entities next to less common ones, which
+# take the html.unescape path), full-width and ligature forms, non-breaking and zero-width spaces, control characters and
+# runs of whitespace
+NOISE = ['&amp;', '&amp;lt;b&amp;gt;&copy;', 'R&amp;amp;D&hellip;', '&quot;', '&#39;', '&nbsp;', '\uff26\uff4f\uff58', '\ufb01ne', 'cafe\u0301', '\u00a0', '\u200b', '\x07', '  ', '\n\t', '\U0001f600']
+
+
+def make_comments(n_comments:int, seed:int=0):
+    """
+    Generates synthetic comments of 3 to 80 words with HTML entities, Unicode variants and irregular whitespace mixed in.
+
+    Parameters:
+    - n_comments (int): Number of comments to generate.
+    - seed (int): Random seed.
+
+    Returns:
+    - pd.Series: Series of synthetic comments.
+    """
+
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"word{i}" for i in range(5000)] + NOISE * 5)
+    lengths = rng.integers(3, 80, n_comments)
+    return pd.Series([" ".join(rng.choice(vocab, length)) for length in lengths])
+
+def normalize_naive(series:pd.Series):
+    """
+    Per-row Python baseline with the same output as normalize_text.
+    """
+    invisible = re.compile('[\x00-\x08\x0e-\x1f\x7f\u200b-\u200d\u2060\ufeff]')
+    def normalize(text):
+        text = unicodedata.normalize('NFKC', html.unescape(text))
+        return re.sub(r'\s+', ' ', invisible.sub('', text)).strip()
+    return series.map(normalize)
+
+def benchmark_threads(comments:pd.Series, thread_counts:list, baseline_rows:int=200000):
+    """
+    Measures normalisation throughput for each thread count, and for the per-row Python baseline on a subset.
+
+    Parameters:
+    - comments (pd.Series): Comments to normalise.
+    - thread_counts (list): Thread counts to benchmark.
+    - baseline_rows (int): Number of rows to run the per-row baseline on (0 to skip it).
+
+    Returns:
+    - pd.DataFrame: Throughput (rows/s and MB/s) and speedup over the baseline per configuration.
+    """
+
+    n_bytes = comments.str.len().sum()
+    rows = []
+    if baseline_rows:
+        subset = comments.iloc[:baseline_rows]
+        start = time.perf_counter()
+        expected = normalize_naive(subset)
+        elapsed = time.perf_counter() - start
+        assert expected.equals(normalize_text(subset, n_jobs=1)), "normalize_text differs from the per-row baseline"
+        rows.append({'method': 'per-row python', 'n_jobs': 1, 'rows_per_s': len(subset) / elapsed,
+                     'mb_per_s': subset.str.len().sum() / elapsed / 1e6})
+
+    for n_jobs in thread_counts:
+        start = time.perf_counter()
+        normalize_text(comments, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        rows.append({'method': 'arrow', 'n_jobs': n_jobs, 'rows_per_s': len(comments) / elapsed, 'mb_per_s': n_bytes / elapsed / 1e6})
+        print(f"{n_jobs} threads: {len(comments) / elapsed:.0f} rows/s")
+
+    results_df = pd.DataFrame(rows)
+    results_df['speedup'] = results_df['rows_per_s'] / results_df['rows_per_s'].iloc[0]
+    return results_df
+
+
+if __name__ == "__main__":
+    N_COMMENTS = 2000000
+    BASELINE_ROWS = 200000
+    THREAD_COUNTS = sorted({1, 2, 4, 8, os.cpu_count()} & set(range(1, os.cpu_count() + 1)))
+
+    comments = make_comments(N_COMMENTS)
+    results_df = benchmark_threads(comments, THREAD_COUNTS, baseline_rows=BASELINE_ROWS)
+    print("\nnormalisation throughput:")
+    print(results_df.to_string(index=False))
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import resource
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from bertopic import BERTopic
+from hdbscan import HDBSCAN
+from sklearn.datasets import make_blobs
+from src.compare_topics import factorize_topics, contingency_matrix, adjusted_rand_index, normalized_mutual_info
+from src.sample_fit import fit_predict_sampled
+
+
+def make_corpus(n_docs:int, n_clusters:int=30, dim:int=384, seed:int=0):
+    """
+    Generates a synthetic corpus of clustered embeddings with matching documents drawn from a per-cluster vocabulary, so
+    the benchmark measures clustering cost without paying for embedding.
+
+    Parameters:
+    - n_docs (int): Number of documents.
+    - n_clusters (int): Number of underlying clusters.
+    - dim (int): Embedding dimension.
+    - seed (int): Random seed.
+
+    Returns:
+    - list: Synthetic documents.
+    - np.ndarray: Embeddings of shape (n_docs, dim).
+    """
+
+    embeddings, clusters = make_blobs(n_samples=n_docs, centers=n_clusters, n_features=dim, cluster_std=4.0, random_state=seed)
+    rng = np.random.default_rng(seed)
+    words = rng.integers(0, 50, size=(n_docs, 12))
+    documents = [" ".join(f"c{cluster}w{word}" for word in row) for cluster, row in zip(clusters, words)]
+    return documents, embeddings.astype(np.float32)
+
+def build_topic_model(n_topics:int, min_topic_size:int=5, min_samples_core_point:int=5):
+    """
+    Builds a BERTopic model configured like run_topic_model_openai.
+    """
+    hdbscan_model = HDBSCAN(min_cluster_size=min_topic_size, min_samples=min_samples_core_point, metric='euclidean', prediction_data=True)
+    return BERTopic(hdbscan_model=hdbscan_model, nr_topics=n_topics + 1, low_memory=True)
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MB. Unlike tracemalloc this includes native allocations, e.g.
+    numba and pynndescent in UMAP. A child process starts from its parent's RSS at fork time, so only processes spawned
+    from a small parent give a meaningful figure.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10  # bytes on macOS, KB on Linux
+
+def save_corpus(corpus_dir:str, n_docs:int):
+    """Generates the synthetic corpus and saves it to corpus_dir, in a child process so the parent stays small."""
+    documents, embeddings = make_corpus(n_docs)
+    pd.DataFrame({'document': documents}).to_parquet(os.path.join(corpus_dir, 'documents.parquet'))
+    np.save(os.path.join(corpus_dir, 'embeddings.npy'), embeddings)
+
+def run_config(corpus_dir:str, n_topics:int, sample_ratio:float, n_jobs:int):
+    """
+    Fits one configuration in a fresh process, on the corpus saved by benchmark_sample_ratios. A small warm-up fit and
+    prediction runs first so numba compilation is not timed. Timing runs without any allocation tracing. Memory is the
+    peak RSS of the process, which never resets, so the increase of the peak during the timed fit is reported too.
+    Prediction workers are not included.
+
+    Returns:
+    - dict: Elapsed seconds, peak RSS of the process, its increase during the fit, and the resulting topics.
+    """
+    warmup_documents, warmup_embeddings = make_corpus(5000, seed=1)
+    fit_predict_sampled(build_topic_model(n_topics), warmup_documents, warmup_embeddings, sample_ratio=0.9, n_jobs=1)
+
+    documents = pd.read_parquet(os.path.join(corpus_dir, 'documents.parquet'))['document'].tolist()
+    embeddings = np.load(os.path.join(corpus_dir, 'embeddings.npy'))
+    topic_model = build_topic_model(n_topics)
+
+    peak_before = peak_rss_mb()
+    start = time.perf_counter()
+    if sample_ratio is None:
+        topics, _ = topic_model.fit_transform(documents, embeddings)
+    else:
+        topics, _ = fit_predict_sampled(topic_model, documents, embeddings, sample_ratio=sample_ratio, n_jobs=n_jobs)
+    elapsed = time.perf_counter() - start
+    peak_after = peak_rss_mb()
+
+    return {
+        'seconds': elapsed,
+        'peak_rss_mb': peak_after,
+        'fit_rss_increase_mb': peak_after - peak_before,
+        'topics': np.asarray(topics)}
+
+def benchmark_sample_ratios(n_docs:int, n_topics:int, sample_ratios:list, n_jobs:int=None):
+    """
+    Compares a full fit against sample-fit / parallel-predict at several sample ratios. The corpus is generated once and
+    every configuration runs in its own spawned process, so their peak RSS figures are independent.
+
+    Parameters:
+    - n_docs (int): Number of synthetic documents.
+    - n_topics (int): Number of topics to reduce to.
+    - sample_ratios (list): Sample ratios to benchmark.
+    - n_jobs (int): Number of prediction worker processes.
+
+    Returns:
+    - pd.DataFrame: Seconds, speedup, peak RSS and ARI/NMI agreement with the full fit per configuration.
+    """
+
+    rows = []
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            pool.submit(save_corpus, corpus_dir, n_docs).result()
+
+        for sample_ratio in [None] + list(sample_ratios):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(run_config, corpus_dir, n_topics, sample_ratio, n_jobs).result()
+
+            if sample_ratio is None:
+                full_topics = result['topics']
+            (codes_full, topics_full), (codes_run, topics_run) = factorize_topics(full_topics), factorize_topics(result['topics'])
+            counts, _, _ = contingency_matrix(codes_full, codes_run, topics_full, topics_run)
+            rows.append({
+                'sample_ratio': 1.0 if sample_ratio is None else sample_ratio,
+                'seconds': result['seconds'],
+                'peak_rss_mb': result['peak_rss_mb'],
+                'fit_rss_increase_mb': result['fit_rss_increase_mb'],
+                'ari_vs_full': adjusted_rand_index(counts),
+                'nmi_vs_full': normalized_mutual_info(counts)})
+            print(f"sample ratio {rows[-1]['sample_ratio']}: {result['seconds']:.1f}s")
+
+    results_df = pd.DataFrame(rows)
+    results_df['speedup'] = results_df['seconds'].iloc[0] / results_df['seconds']
+    return results_df
+
+
+if __name__ == "__main__":
+    N_DOCS = 200000
+    N_TOPICS = 20
+    SAMPLE_RATIOS = [0.05, 0.1, 0.25, 0.5]
+    N_JOBS = os.cpu_count()
+
+    results_df = benchmark_sample_ratios(N_DOCS, N_TOPICS, SAMPLE_RATIOS, n_jobs=N_JOBS)
+    print("\nsample-fit vs full fit:")
+    print(results_df.to_string(index=False))
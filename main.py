@@ -20,7 +20,7 @@ if __name__ == "__main__":
     SUMMARY_COLUMN_NAME = "description"
     NTOPICS = 21
     TOPIC_SUMMARY_OUTPUT_FILE_PATH = "outputs/topic_summaries.csv"
-    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df.csv"
+    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df.parquet"
     ENGAGEMENTS_OUTPUT_FILE_PATH = 'outputs/engagements.csv'
 
     EXCEL_FILE_PATH = "data/fox_news_comments.xlsx"
@@ -29,7 +29,7 @@ if __name__ == "__main__":
     SUMMARY_COLUMN_NAME = "description"
     NTOPICS = 21
     TOPIC_SUMMARY_OUTPUT_FILE_PATH = "outputs/topic_summaries.csv"
-    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df.csv"
+    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df.parquet"
 
     ARTICLE_SHEET_NAME = "articles_data"
     COMMENT_SHEET_NAME = "comments_for_published_articles"
@@ -37,6 +37,6 @@ if __name__ == "__main__":
     ARTICLE_COLS = ['title', 'published_date', 'description', 'canonical_url', 'conversation_id', 'thumbnail_url'] #[article_thumbnail_alt_text, article_text, article_author]
     COMMENT_COLS = ['conversation_id', 'author_id', 'written_date', 'text_content']
     OUTPUT_FILE_PATH = 'outputs/engagements.csv'
-    DOC_TOPIC_DF = 'outputs/doc_topic_df.csv'
+    DOC_TOPIC_DF = 'outputs/doc_topic_df.parquet'
 
     main()
\ No newline at end of file
@@ -0,0 +1,318 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from itertools import combinations
+from scipy import sparse
+from utils.keys import doc_key
+
+MISSING = -1  # topic code of documents that are absent from a run (codes index each run's sorted topics, see factorize_topics)
+
+
+def load_doc_topics(path:str, key_col:str=None, topic_col:str='Topic'):
+    """
+    Loads a doc-topic artifact written by topic_model.py and reduces it to a stable integer document key and a topic label.
+    Integer key columns are used as-is; any other key column (description text, conversation ids) is content hashed.
+
+    Parameters:
+    - path (str): Path to a doc-topic CSV or Parquet file.
+    - key_col (str): Column identifying the document. Defaults to 'doc_id' if the file has one, else 'Document_description'
+      (older CSV outputs); both give the same key for the same description.
+    - topic_col (str): Column holding the assigned topic.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with 'doc_key' (int64) and 'Topic' (int32) columns, one row per document.
+    """
+
+    if path.endswith('.parquet'):
+        available = pq.read_schema(path).names
+    else:
+        available = pd.read_csv(path, nrows=0).columns
+    if key_col is None:
+        key_col = 'doc_id' if 'doc_id' in available else 'Document_description'
+
+    if path.endswith('.parquet'):
+        df = pq.read_table(path, columns=[key_col, topic_col], memory_map=True).to_pandas()
+    else:
+        df = pd.read_csv(path, usecols=[key_col, topic_col])
+
+    if pd.api.types.is_integer_dtype(df[key_col]):
+        keys = df[key_col].to_numpy(dtype=np.int64)
+    else:
+        keys = doc_key(df[key_col])
+
+    run_df = pd.DataFrame({'doc_key': keys, 'Topic': df[topic_col].to_numpy(dtype=np.int32)})
+
+    n_duplicates = run_df['doc_key'].duplicated().sum()
+    if n_duplicates:
+        print(f"dropping {n_duplicates} duplicate documents from {path}")
+        run_df = run_df.drop_duplicates(subset='doc_key', keep='first')
+
+    return run_df
+
+def factorize_topics(labels:np.ndarray):
+    """
+    Encodes topic labels as codes into the sorted array of distinct topics, with a hash-based factorize rather than a sort
+    of the labels.
+
+    Parameters:
+    - labels (np.ndarray): Topic labels of one run.
+
+    Returns:
+    - np.ndarray: The int32 code of each label.
+    - np.ndarray: The distinct topics in ascending order, so topics[codes] == labels.
+    """
+
+    codes, topics = pd.factorize(labels)
+    order = np.argsort(topics)
+    remap = np.empty(len(topics), dtype=np.int32)
+    remap[order] = np.arange(len(topics), dtype=np.int32)
+    return remap[codes], np.asarray(topics)[order]
+
+def align_runs(runs:dict):
+    """
+    Aligns any number of runs on their document key with a hash join against the union of all keys, and encodes each run's
+    topics once so every pair can be compared on integer codes.
+
+    Parameters:
+    - runs (dict): Mapping of run name to a DataFrame with 'doc_key' and 'Topic' columns (see load_doc_topics).
+
+    Returns:
+    - pd.Index: The union of document keys, in first-seen order.
+    - np.ndarray: An int32 topic code matrix of shape (n_docs, n_runs); documents missing from a run get MISSING.
+    - list: The sorted topics of each run, so topics[j][codes[:, j]] gives run j's labels.
+    """
+
+    key_index = pd.Index(pd.unique(np.concatenate([run_df['doc_key'].to_numpy() for run_df in runs.values()])))
+
+    codes = np.full((len(key_index), len(runs)), MISSING, dtype=np.int32, order='F')  # column-major, one run per column
+    topics = []
+    for j, run_df in enumerate(runs.values()):
+        rows = key_index.get_indexer(run_df['doc_key'].to_numpy())
+        codes[rows, j], run_topics = factorize_topics(run_df['Topic'].to_numpy())
+        topics.append(run_topics)
+
+    return key_index, codes, topics
+
+def contingency_matrix(codes_a:np.ndarray, codes_b:np.ndarray, topics_a:np.ndarray, topics_b:np.ndarray):
+    """
+    Builds the sparse contingency matrix between two aligned topic code arrays (see factorize_topics) with one bincount
+    over the pair codes. Rows and columns follow the runs' topics, so topics that none of the codes use are empty.
+
+    Parameters:
+    - codes_a (np.ndarray): Topic codes from the first run.
+    - codes_b (np.ndarray): Topic codes from the second run, aligned with codes_a.
+    - topics_a (np.ndarray): Sorted topics of the first run.
+    - topics_b (np.ndarray): Sorted topics of the second run.
+
+    Returns:
+    - scipy.sparse.csr_matrix: Counts of documents per (topic_a, topic_b) pair.
+    - np.ndarray: The topic of each row (topics_a).
+    - np.ndarray: The topic of each column (topics_b).
+    """
+
+    n_a, n_b = len(topics_a), len(topics_b)
+    pair_codes = codes_a.astype(np.int64) * n_b + codes_b
+    if n_a * n_b <= 4 * len(pair_codes) + 1000000:
+        counts = sparse.csr_matrix(np.bincount(pair_codes, minlength=n_a * n_b).reshape(n_a, n_b))
+    else:  # too many topic pairs for a dense count array, count only the pairs that occur
+        pairs, pair_counts = np.unique(pair_codes, return_counts=True)
+        counts = sparse.csr_matrix((pair_counts, (pairs // n_b, pairs % n_b)), shape=(n_a, n_b))
+    return counts, topics_a, topics_b
+
+def adjusted_rand_index(counts:sparse.csr_matrix):
+    """
+    Computes the adjusted Rand index from a contingency matrix.
+
+    Parameters:
+    - counts (scipy.sparse.csr_matrix): Contingency matrix between two runs.
+
+    Returns:
+    - float: ARI, 1.0 for identical partitions and ~0.0 for independent ones.
+    """
+
+    n = counts.sum()
+    sum_comb = (counts.data * (counts.data - 1) / 2).sum()
+    row_sums = np.asarray(counts.sum(axis=1)).ravel()
+    col_sums = np.asarray(counts.sum(axis=0)).ravel()
+    sum_comb_a = (row_sums * (row_sums - 1) / 2).sum()
+    sum_comb_b = (col_sums * (col_sums - 1) / 2).sum()
+
+    expected = sum_comb_a * sum_comb_b / (n * (n - 1) / 2) if n > 1 else 0.0
+    max_index = (sum_comb_a + sum_comb_b) / 2
+    if max_index == expected:  # both partitions trivial (single cluster or all singletons)
+        return 1.0
+    return float((sum_comb - expected) / (max_index - expected))
+
+def normalized_mutual_info(counts:sparse.csr_matrix):
+    """
+    Computes the normalized mutual information (arithmetic mean normalisation) from a contingency matrix.
+
+    Parameters:
+    - counts (scipy.sparse.csr_matrix): Contingency matrix between two runs.
+
+    Returns:
+    - float: NMI between 0.0 and 1.0.
+    """
+
+    n = counts.sum()
+    row_sums = np.asarray(counts.sum(axis=1)).ravel()
+    col_sums = np.asarray(counts.sum(axis=0)).ravel()
+    p_a, p_b = row_sums[row_sums > 0] / n, col_sums[col_sums > 0] / n  # empty topics don't contribute
+    entropy_a = -np.sum(p_a * np.log(p_a))
+    entropy_b = -np.sum(p_b * np.log(p_b))
+    if entropy_a == 0 and entropy_b == 0:
+        return 1.0
+
+    coo = counts.tocoo()
+    nij = coo.data.astype(float)
+    mutual_info = np.sum((nij / n) * (np.log(nij * n) - np.log(row_sums[coo.row] * col_sums[coo.col])))
+    return float(max(mutual_info, 0.0) / ((entropy_a + entropy_b) / 2))
+
+def topic_overlap(counts:sparse.csr_matrix, topics_a:np.ndarray, topics_b:np.ndarray):
+    """
+    Lists every pair of topics that share documents, with the Jaccard overlap of their document sets.
+
+    Parameters:
+    - counts (scipy.sparse.csr_matrix): Contingency matrix between two runs.
+    - topics_a (np.ndarray): Topic of each row.
+    - topics_b (np.ndarray): Topic of each column.
+
+    Returns:
+    - pd.DataFrame: One row per overlapping (topic_a, topic_b) pair, sorted by topic_a and descending overlap.
+    """
+
+    coo = counts.tocoo()
+    row_sums = np.asarray(counts.sum(axis=1)).ravel()
+    col_sums = np.asarray(counts.sum(axis=0)).ravel()
+
+    overlap_df = pd.DataFrame({
+        'topic_a': topics_a[coo.row],
+        'topic_b': topics_b[coo.col],
+        'n_docs': coo.data,
+        'jaccard': coo.data / (row_sums[coo.row] + col_sums[coo.col] - coo.data)})
+    return overlap_df.sort_values(by=['topic_a', 'n_docs'], ascending=[True, False]).reset_index(drop=True)
+
+def disagreement_mask(codes_a:np.ndarray, codes_b:np.ndarray, counts:sparse.csr_matrix):
+    """
+    Flags the documents whose second-run topic differs from the best-matching topic of their first-run topic (the
+    second-run topic sharing the most documents with it).
+
+    Returns:
+    - np.ndarray: Boolean mask over the documents.
+    - np.ndarray: The expected second-run topic code of each document.
+    """
+    expected_b = np.asarray(counts.argmax(axis=1)).ravel()[codes_a]
+    return codes_b != expected_b, expected_b
+
+def disagreements(keys:np.ndarray, codes_a:np.ndarray, codes_b:np.ndarray, counts:sparse.csr_matrix, topics_a:np.ndarray, topics_b:np.ndarray):
+    """
+    Finds documents whose topic in the second run differs from the best-matching topic of their first-run topic, where the
+    best match is the second-run topic sharing the most documents.
+
+    Parameters:
+    - keys (np.ndarray): Document keys, aligned with the codes.
+    - codes_a (np.ndarray): Topic codes from the first run.
+    - codes_b (np.ndarray): Topic codes from the second run.
+    - counts (scipy.sparse.csr_matrix): Contingency matrix from contingency_matrix(codes_a, codes_b, topics_a, topics_b).
+    - topics_a (np.ndarray): Topic of each row.
+    - topics_b (np.ndarray): Topic of each column.
+
+    Returns:
+    - pd.DataFrame: One row per disagreeing document with its topic in each run and the expected second-run topic.
+    """
+
+    mask, expected_b = disagreement_mask(codes_a, codes_b, counts)
+
+    return pd.DataFrame({
+        'doc_key': keys[mask],
+        'topic_a': topics_a[codes_a[mask]],
+        'topic_b': topics_b[codes_b[mask]],
+        'expected_topic_b': topics_b[expected_b[mask]]})
+
+def compare_runs(run_paths:dict, output_dir:str=None, key_col:str=None, verbose=False):
+    """
+    Compares any number of topic model runs pairwise. Runs are aligned on a stable document key and every pair is scored
+    on the documents both runs contain.
+
+    Parameters:
+    - run_paths (dict): Mapping of run name to doc-topic file path.
+    - output_dir (str): If given, the pairwise summary, topic overlaps and per-document disagreements are saved here as CSV files.
+      The per-document disagreement tables are only built in that case; otherwise only their sizes are computed.
+    - key_col (str): Column identifying the document in each file (see load_doc_topics).
+    - verbose (bool): If True, prints the overlap table of each pair.
+
+    Returns:
+    - pd.DataFrame: One row per pair of runs with shared document counts, ARI and NMI.
+    """
+
+    start = time.perf_counter()
+    print(f"\nloading {len(run_paths)} runs...\n")
+    runs = {name: load_doc_topics(path, key_col=key_col) for name, path in run_paths.items()}
+    keys, codes, topics = align_runs(runs)
+    print(f"aligned {len(keys)} documents in {time.perf_counter() - start:.2f}s")
+
+    names = list(runs)
+    summary_rows, overlap_dfs, disagreement_dfs = [], [], []
+    for i, j in combinations(range(len(names)), 2):
+        shared = (codes[:, i] != MISSING) & (codes[:, j] != MISSING)
+        n_shared = int(shared.sum())
+        if not n_shared:
+            print(f"no shared documents between {names[i]} and {names[j]}, skipping")
+            continue
+
+        if n_shared == len(keys):
+            codes_a, codes_b = codes[:, i], codes[:, j]
+        else:
+            codes_a, codes_b = codes[shared, i], codes[shared, j]
+        counts, topics_a, topics_b = contingency_matrix(codes_a, codes_b, topics[i], topics[j])
+
+        summary_rows.append({
+            'run_a': names[i],
+            'run_b': names[j],
+            'shared_docs': n_shared,
+            'only_in_a': int((codes[:, i] != MISSING).sum()) - n_shared,
+            'only_in_b': int((codes[:, j] != MISSING).sum()) - n_shared,
+            'ari': adjusted_rand_index(counts),
+            'nmi': normalized_mutual_info(counts),
+            'disagreements': int(disagreement_mask(codes_a, codes_b, counts)[0].sum())})
+
+        pair_overlap = topic_overlap(counts, topics_a, topics_b)
+        if verbose:
+            print(f"\ntopic overlap {names[i]} vs {names[j]}:")
+            print(pair_overlap.head(20))
+
+        overlap_dfs.append(pair_overlap.assign(run_a=names[i], run_b=names[j]))
+        if output_dir is not None:
+            pair_keys = keys.to_numpy() if n_shared == len(keys) else keys.to_numpy()[shared]
+            pair_disagreements = disagreements(pair_keys, codes_a, codes_b, counts, topics_a, topics_b)
+            disagreement_dfs.append(pair_disagreements.assign(run_a=names[i], run_b=names[j]))
+
+    summary_df = pd.DataFrame(summary_rows)
+    print("\npairwise comparison:")
+    print(summary_df)
+    print(f"\ncompared {len(summary_rows)} pairs in {time.perf_counter() - start:.2f}s")
+
+    if output_dir is not None and summary_rows:
+        os.makedirs(output_dir, exist_ok=True)
+        summary_df.to_csv(os.path.join(output_dir, 'run_comparison.csv'), index=False)
+        pd.concat(overlap_dfs, ignore_index=True).to_csv(os.path.join(output_dir, 'topic_overlap.csv'), index=False)
+        pd.concat(disagreement_dfs, ignore_index=True).to_csv(os.path.join(output_dir, 'disagreements.csv'), index=False)
+        print(f"\nSaved comparison to {output_dir}")
+
+    return summary_df
+
+
+if __name__ == "__main__":
+    """
+    Main execution block that compares the doc-topic outputs of several topic model runs, e.g. the main BERTopic model
+    against the OpenAI embedding model.
+    """
+    VERBOSE = True
+    RUN_PATHS = {
+        'main_model': 'outputs/doc_topic_df.parquet',
+        'openai_model': 'outputs/doc_topic_df_openai.parquet'}
+    COMPARISON_OUTPUT_DIR = 'outputs/comparison'
+
+    compare_runs(RUN_PATHS, output_dir=COMPARISON_OUTPUT_DIR, verbose=VERBOSE)
@@ -0,0 +1,172 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from bertopic.backend import BaseEmbedder
+
+# model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def load_sentence_model(model_name:str, backend:str='torch'):
+    """
+    Loads a sentence-transformer model for CPU inference.
+
+    Parameters:
+    - model_name (str): Name or path of the sentence-transformer model.
+    - backend (str): 'torch' for the plain model, 'int8' for a dynamically int8-quantized copy of its linear layers, or
+      'onnx' for ONNX Runtime inference (requires sentence-transformers>=3.2 with the onnx extra).
+
+    Returns:
+    - SentenceTransformer: The loaded model.
+    """
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'torch':
+        return SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        model = SentenceTransformer(model_name, device='cpu')
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == 'onnx':
+        try:
+            return SentenceTransformer(model_name, device='cpu', backend='onnx')
+        except TypeError as e:
+            raise ImportError("The 'onnx' backend requires sentence-transformers>=3.2 (pip install 'sentence-transformers[onnx]')") from e
+    raise ValueError(f"Unknown embedding backend '{backend}', expected 'torch', 'int8' or 'onnx'")
+
+def _init_worker(model_name:str, backend:str, n_threads:int):
+    """Loads the model into a worker process and pins its intra-op thread count so workers don't oversubscribe the cores."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(n_threads)
+    _worker_model = load_sentence_model(model_name, backend)
+
+def _embedding_dim():
+    """Returns the embedding dimension of the model loaded in a worker process."""
+    return _worker_model.get_sentence_embedding_dimension()
+
+def _encode_batch(batch:list):
+    """Encodes one length-sorted batch in a worker process."""
+    return _worker_model.encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False)
+
+class ParallelSentenceEmbedder(BaseEmbedder):
+    """
+    A BERTopic embedding backend that encodes documents with a sentence-transformer model spread over a pool of CPU worker
+    processes. Documents are sorted by length before batching so each batch pads to a similar length, and the embeddings
+    are returned in the original document order.
+
+    Attributes:
+    - model_name (str): Name or path of the sentence-transformer model.
+    - n_workers (int): Number of worker processes. Defaults to the number of CPU cores.
+    - batch_size (int): Number of documents per batch sent to a worker.
+    - backend (str): 'torch', 'int8' or 'onnx' (see load_sentence_model).
+    - n_threads (int): Intra-op torch threads per worker (or for the in-process model when n_workers is 1). Defaults to
+      the worker's share of the cores, cpu_count // n_workers.
+
+    Methods:
+    - embed(documents, verbose): Embeds a list of documents and returns a (n_documents, dim) array.
+    - embedding_dim(): Returns the embedding dimension of the model.
+    - start(): Starts the worker pool so it can be reused across embed calls.
+    - close(): Shuts the worker pool down.
+    """
+
+    def __init__(self, model_name='paraphrase-MiniLM-L6-v2', n_workers=None, batch_size=64, backend='torch', n_threads=None):
+        super().__init__()
+        self.model_name = model_name
+        self.n_workers = n_workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.backend = backend
+        self.n_threads = n_threads or max(1, os.cpu_count() // self.n_workers)
+        self._pool = None
+        self._model = None
+        self._dim = None
+
+    def start(self):
+        """
+        Starts the worker pool, loading the model once in every worker.
+        """
+        if self._pool is None and self.n_workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=get_context('spawn'),  # fork is unsafe once torch has started its thread pools
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.n_threads))
+        return self
+
+    def close(self):
+        """
+        Shuts the worker pool down.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __getstate__(self):
+        # the pool can't be pickled, e.g. when a fitted BERTopic model is sent to worker processes
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load_model(self):
+        """Loads the model in this process (used when n_workers is 1, or to look up the embedding dimension without a pool)."""
+        if self._model is None:
+            import torch
+            torch.set_num_threads(self.n_threads)
+            self._model = load_sentence_model(self.model_name, self.backend)
+        return self._model
+
+    def embedding_dim(self):
+        """
+        Returns the embedding dimension of the model, asking a worker if the pool is running and loading the model in
+        this process otherwise.
+        """
+        if self._dim is None:
+            if self._pool is not None:
+                self._dim = self._pool.submit(_embedding_dim).result()
+            else:
+                self._dim = self._load_model().get_sentence_embedding_dimension()
+        return self._dim
+
+    def embed(self, documents, verbose=False):
+        """
+        Embeds documents with the worker pool, starting a temporary pool if none is running.
+
+        Parameters:
+        - documents (list): List of documents to embed.
+        - verbose (bool): If True, prints progress information.
+
+        Returns:
+        - np.ndarray: Array of shape (n_documents, dim) with embeddings in the input order.
+        """
+
+        documents = list(documents)
+        if not documents:
+            return np.empty((0, self.embedding_dim()), dtype=np.float32)
+
+        order = np.argsort([len(doc) for doc in documents], kind='stable')
+        batches = [[documents[i] for i in order[start:start + self.batch_size]] for start in range(0, len(documents), self.batch_size)]
+
+        if verbose:
+            print(f"embedding {len(documents)} documents in {len(batches)} batches on {self.n_workers} workers...")
+
+        if self.n_workers == 1:
+            batch_embeddings = [self._load_model().encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False) for batch in batches]
+        elif self._pool is not None:
+            batch_embeddings = list(self._pool.map(_encode_batch, batches))
+        else:
+            with self:
+                batch_embeddings = list(self._pool.map(_encode_batch, batches))
+
+        sorted_embeddings = np.vstack(batch_embeddings)
+        self._dim = sorted_embeddings.shape[1]
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
@@ -0,0 +1,316 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from utils.partitions import list_partitions, partition_path, read_partitions, write_partition
+
+USER_CONVERSATION_KEYS = ['user_id', 'conversation_id']
+USER_CONVERSATION_VALUES = ['count']
+ARTICLE_KEYS = ['conversation_id']
+ARTICLE_VALUES = ['n_comments', 'total_likes', 'total_views']
+USER_CONVERSATION_REFRESH_DAYS = 1
+ARTICLE_REFRESH_DAYS = 3
+# key of the partial aggregate of comments without a parseable date, stored as root/undated.parquet next to the day partitions
+UNDATED = 'undated'
+# timestamps starting with an ISO date can be compared as strings, so older rows can be skipped before any date parsing
+ISO_DATE_PREFIX = r'^\d{4}-\d{2}-\d{2}'
+
+
+def _comment_dates(comment_data:pd.DataFrame, date_col:str):
+    """Parses the comment timestamps to calendar days; unparseable values (e.g. 'missing') become NaT."""
+    return pd.to_datetime(comment_data[date_col], errors='coerce', format='mixed').dt.normalize()
+
+def _refresh_cutoff(root:str, refresh_days:int):
+    """
+    Returns the first day the next update of a store table needs comments from: the oldest of the latest refresh_days
+    partitions, or the day after the latest partition if refresh_days is 0. None if the table is empty.
+    """
+    existing = list_partitions(root)
+    if not existing:
+        return None
+    return existing[-min(refresh_days, len(existing))] if refresh_days else existing[-1] + pd.Timedelta(days=1)
+
+def _recent_filter(date_col:str, cutoff):
+    """
+    Builds a pyarrow filter that keeps the comments written on or after cutoff. Only timestamps starting with an ISO date
+    are compared (as strings); any other value, e.g. 'missing' or another date format, is kept and parsed later.
+    """
+    date = pc.field(date_col)
+    return ~(pc.match_substring_regex(date, ISO_DATE_PREFIX) & (date < f"{pd.Timestamp(cutoff):%Y-%m-%d}"))
+
+def comments_filter(store_dir:str, table:str, date_col:str='written_date', refresh_days:int=None):
+    """
+    Returns a filter for read_cols (see utils.reader) that reads only the comments the next update of a store table needs,
+    so runs don't load the full comment history.
+
+    Parameters:
+    - store_dir (str): Directory of the engagement store.
+    - table (str): 'user_conversation' or 'article'.
+    - date_col (str): Timestamp column used to partition the comments.
+    - refresh_days (int): Must match the update's refresh_days. Defaults to the table's default.
+
+    Returns:
+    - pyarrow.compute.Expression: The row filter, or None if the table is empty and the full history is needed.
+    """
+    if refresh_days is None:
+        refresh_days = USER_CONVERSATION_REFRESH_DAYS if table == 'user_conversation' else ARTICLE_REFRESH_DAYS
+    cutoff = _refresh_cutoff(os.path.join(store_dir, table), refresh_days)
+    return None if cutoff is None else _recent_filter(date_col, cutoff)
+
+def _recent_rows(comment_data:pd.DataFrame, date_col:str, cutoff):
+    """
+    Keeps the comments that _recent_filter keeps, using only the date column, and resets the index so the rows and the
+    dates parsed from them stay aligned whatever index the caller's frame has.
+    """
+    if cutoff is None:
+        return comment_data.reset_index(drop=True)
+    dates = pa.table({date_col: comment_data[date_col].astype(str).to_numpy(dtype=object), 'row': np.arange(len(comment_data))})
+    rows = dates.filter(_recent_filter(date_col, cutoff))['row'].to_numpy()
+    return comment_data.iloc[rows].reset_index(drop=True)
+
+def _partial_path(root:str, date):
+    """Returns the Parquet file path of the partial aggregate for a day, or for the undated comments."""
+    return os.path.join(root, f"{UNDATED}.parquet") if date == UNDATED else partition_path(root, date)
+
+def _report_undated(dates:pd.Series, date_col:str):
+    """Logs how many comments have no parseable date."""
+    n_undated = dates.isna().sum()
+    if n_undated:
+        print(f"{n_undated} of {len(dates)} comments read have no parseable '{date_col}'; they are kept in the all-time totals but not in any time window")
+
+def _dates_to_process(dates:pd.Series, root:str, refresh_days:int):
+    """
+    Picks the days that need (re)aggregating: days with no partition yet, plus the latest refresh_days existing partitions,
+    which may have been written before that day's comments were complete.
+    """
+    existing = list_partitions(root)
+    refresh = set(existing[-refresh_days:]) if refresh_days else set()
+    return sorted(date for date in dates.dropna().unique() if date not in existing or date in refresh)
+
+def _partition_manifest(root:str):
+    """Maps every partial aggregate file of a table (day partitions and the undated one) to its modification time."""
+    paths = [partition_path(root, date) for date in list_partitions(root)]
+    if os.path.exists(_partial_path(root, UNDATED)):
+        paths.append(_partial_path(root, UNDATED))
+    return {os.path.relpath(path, root): os.stat(path).st_mtime_ns for path in paths}
+
+def _totals_manifest(totals_path:str):
+    """Returns the partition manifest stored with the totals, or None if there are no totals."""
+    if not os.path.exists(totals_path):
+        return None
+    metadata = pq.read_schema(totals_path).metadata or {}
+    return json.loads(metadata[b'partitions']) if b'partitions' in metadata else None
+
+def _write_totals(totals:pa.Table, totals_path:str, manifest:dict):
+    """
+    Writes the totals together with the manifest of the partitions they include, in one atomic file replace, so the
+    totals can never claim partitions they don't hold.
+    """
+    table = totals.replace_schema_metadata({**(totals.schema.metadata or {}), b'partitions': json.dumps(manifest).encode()})
+    pq.write_table(table, totals_path + '.tmp')
+    os.replace(totals_path + '.tmp', totals_path)
+
+def _sum_partitions(root:str, keys:list, values:list):
+    """Recomputes the totals of a table from all its partial aggregates on disk."""
+    parts = [pd.read_parquet(os.path.join(root, path), columns=keys + values) for path in _partition_manifest(root)]
+    if not parts:
+        return pd.DataFrame(columns=keys + values)
+    return pd.concat(parts, ignore_index=True).groupby(keys, as_index=False)[values].sum()
+
+def _add_delta(totals:pa.Table, delta:pd.DataFrame, keys:list, values:list):
+    """
+    Adds the grouped delta to the totals (None if there are none yet) with an Arrow hash join on the keys, and drops the
+    rows whose values all end up zero.
+    """
+    delta = pa.Table.from_pandas(delta, preserve_index=False)
+    if totals is None:
+        merged = delta
+    else:
+        totals = totals.select(keys + values)
+        delta = delta.select(keys + values).cast(totals.schema).rename_columns(keys + [f"{v}_delta" for v in values])
+        joined = totals.join(delta, keys, join_type='full outer')
+        merged = pa.table(
+            [joined[k] for k in keys] + [pc.add(pc.fill_null(joined[v], 0), pc.fill_null(joined[f"{v}_delta"], 0)) for v in values],
+            names=keys + values)
+
+    nonzero = pc.field(values[0]) != 0
+    for v in values[1:]:
+        nonzero = nonzero | (pc.field(v) != 0)
+    return merged.filter(nonzero)
+
+def _load_totals(root:str, keys:list, values:list):
+    """
+    Reads the running totals of a table, or recomputes them from the partitions if the totals don't match the partitions
+    on disk (e.g. a run was interrupted between writing a partition and writing the totals).
+    """
+    totals_path = os.path.join(root, 'totals.parquet')
+    manifest = _partition_manifest(root)
+    if _totals_manifest(totals_path) == manifest:
+        return pd.read_parquet(totals_path)
+    if manifest:
+        print(f"totals in {root} don't match its partitions, recomputing them from the partitions...")
+    return _sum_partitions(root, keys, values)
+
+def _merge_into_totals(root:str, keys:list, values:list, new_partials:dict):
+    """
+    Writes the new daily partial aggregates and merges them into the running totals. A partition that is being rewritten
+    is subtracted from the totals, so only the (small) delta of the new partials is grouped and then added to the totals
+    with a hash join. The totals store a manifest of the partitions they include; if it doesn't match the partitions on
+    disk, e.g. after an interrupted run, the totals are rebuilt from the partitions instead.
+    """
+    totals_path = os.path.join(root, 'totals.parquet')
+    stored_manifest, manifest = _totals_manifest(totals_path), _partition_manifest(root)
+    in_sync = stored_manifest == manifest or (stored_manifest is None and not manifest)  # a new table is in sync
+
+    if in_sync:
+        parts = []
+        for date, partial in new_partials.items():
+            if os.path.exists(_partial_path(root, date)):
+                old = pd.read_parquet(_partial_path(root, date))
+                old[values] = -old[values]
+                parts.append(old)
+            parts.append(partial)
+        delta = pd.concat(parts, ignore_index=True).groupby(keys, as_index=False)[values].sum()
+        totals = _add_delta(pq.read_table(totals_path) if os.path.exists(totals_path) else None, delta, keys, values)
+    else:
+        print(f"totals in {root} don't match its partitions (interrupted run?), rebuilding them from the partitions...")
+
+    for date, partial in new_partials.items():
+        if date == UNDATED:
+            os.makedirs(root, exist_ok=True)
+            partial.to_parquet(_partial_path(root, date) + '.tmp', index=False)
+            os.replace(_partial_path(root, date) + '.tmp', _partial_path(root, date))
+        else:
+            write_partition(partial, root, date)
+
+    if not in_sync:
+        totals = pa.Table.from_pandas(_sum_partitions(root, keys, values), preserve_index=False)
+    if os.path.isdir(root):
+        _write_totals(totals, totals_path, _partition_manifest(root))
+    return totals.to_pandas()
+
+def update_user_conversation_counts(comment_data:pd.DataFrame, store_dir:str, date_col:str='written_date', refresh_days:int=USER_CONVERSATION_REFRESH_DAYS):
+    """
+    Aggregates comment counts per (user, conversation) for each day that has not been aggregated yet, writes them as daily
+    partitions and merges them into the running totals. Only new days (and the latest refresh_days partitions) are
+    processed: comments older than the refresh window are dropped before their dates are parsed, and can be skipped at
+    read time with comments_filter, so the cost scales with daily volume rather than with the full comment history.
+    Comments without a parseable date are re-counted on every run into an undated partial, so they are part of the
+    all-time totals but of no time window.
+
+    Parameters:
+    - comment_data (pd.DataFrame): Comments with 'user_id', 'conversation_id' and date_col columns, either all of them or
+      the ones selected by comments_filter(store_dir, 'user_conversation').
+    - store_dir (str): Directory of the engagement store.
+    - date_col (str): Timestamp column used to partition the comments.
+    - refresh_days (int): Number of latest existing partitions to recompute.
+
+    Returns:
+    - pd.DataFrame: The running totals with 'user_id', 'conversation_id' and 'count' columns.
+    """
+
+    root = os.path.join(store_dir, 'user_conversation')
+    comment_data = _recent_rows(comment_data, date_col, _refresh_cutoff(root, refresh_days))
+    dates = _comment_dates(comment_data, date_col)
+    new_dates = _dates_to_process(dates, root, refresh_days)
+    print(f"\naggregating {len(new_dates)} new day(s) of user-conversation counts...\n")
+
+    _report_undated(dates, date_col)
+
+    new_rows = comment_data[dates.isin(new_dates).to_numpy()].assign(date=dates[dates.isin(new_dates)].to_numpy())
+    partials = new_rows.groupby(['date'] + USER_CONVERSATION_KEYS).size().reset_index(name='count')
+    new_partials = {date: partial.drop(columns='date') for date, partial in partials.groupby('date')}
+    new_partials[UNDATED] = comment_data[dates.isna().to_numpy()].groupby(USER_CONVERSATION_KEYS).size().reset_index(name='count')
+
+    return _merge_into_totals(root, USER_CONVERSATION_KEYS, USER_CONVERSATION_VALUES, new_partials)
+
+def update_article_engagement(comment_data:pd.DataFrame, reaction_data:pd.DataFrame, store_dir:str, date_col:str='written_date', refresh_days:int=ARTICLE_REFRESH_DAYS):
+    """
+    Aggregates comment counts and like and view totals per article (conversation) for each day that has not been
+    aggregated yet, writes them as daily partitions and merges them into the running totals. Reactions are snapshot totals
+    per message attributed to the day the comment was written, so recent days keep collecting reactions; refresh_days
+    controls how many of the latest partitions are recomputed on each run. The likes and views of days older than that
+    are frozen at the values seen when the day was last aggregated, so they lag the current reaction data (delete the
+    store, or raise refresh_days, to bring them up to date). Comments older than the refresh window are dropped before
+    their dates are parsed, and can be skipped at read time with comments_filter. Comments without a parseable date are
+    re-aggregated on every run into an undated partial, so they are part of the all-time totals but of no time window.
+
+    Parameters:
+    - comment_data (pd.DataFrame): Comments with 'conversation_id', 'conv_message_id' and date_col columns, either all of
+      them or the ones selected by comments_filter(store_dir, 'article').
+    - reaction_data (pd.DataFrame): Reactions with 'message_id', 'total_likes' and 'total_views' columns (at least those
+      of the comments above).
+    - store_dir (str): Directory of the engagement store.
+    - date_col (str): Timestamp column used to partition the comments.
+    - refresh_days (int): Number of latest existing partitions to recompute.
+
+    Returns:
+    - pd.DataFrame: The running totals with 'conversation_id', 'n_comments', 'total_likes' and 'total_views' columns.
+    """
+
+    root = os.path.join(store_dir, 'article')
+    comment_data = _recent_rows(comment_data, date_col, _refresh_cutoff(root, refresh_days))
+    dates = _comment_dates(comment_data, date_col)
+    new_dates = _dates_to_process(dates, root, refresh_days)
+    print(f"\naggregating {len(new_dates)} new day(s) of article engagement...\n")
+
+    _report_undated(dates, date_col)
+
+    keep = (dates.isin(new_dates) | dates.isna()).to_numpy()
+    new_rows = comment_data[keep].assign(date=dates[keep].to_numpy()) \
+        .merge(reaction_data, how='left', left_on='conv_message_id', right_on='message_id')
+    for col in ['total_likes', 'total_views']:
+        new_rows[col] = pd.to_numeric(new_rows[col], errors='coerce').fillna(0).round().astype(np.int64)
+
+    aggregations = {'n_comments': ('conv_message_id', 'size'), 'total_likes': ('total_likes', 'sum'), 'total_views': ('total_views', 'sum')}
+    partials = new_rows.groupby(['date'] + ARTICLE_KEYS, as_index=False).agg(**aggregations)
+    new_partials = {date: partial.drop(columns='date') for date, partial in partials.groupby('date')}
+    new_partials[UNDATED] = new_rows[new_rows['date'].isna()].groupby(ARTICLE_KEYS, as_index=False).agg(**aggregations)
+
+    return _merge_into_totals(root, ARTICLE_KEYS, ARTICLE_VALUES, new_partials)
+
+def _load_window(root:str, keys:list, values:list, days:int=None, end=None):
+    """
+    Returns the totals over the last `days` days ending at `end` (default: the latest partition), or the running totals
+    if days is None. Undated comments only count towards the running totals.
+    """
+    if days is None:
+        return _load_totals(root, keys, values)
+
+    dates = list_partitions(root)
+    end = pd.Timestamp(end) if end is not None else (dates[-1] if dates else pd.Timestamp.today().normalize())
+    window = read_partitions(root, start=end - pd.Timedelta(days=days - 1), end=end, columns=keys + values)
+    if window.empty:
+        return pd.DataFrame(columns=keys + values)
+    return window.groupby(keys, as_index=False)[values].sum()
+
+def load_user_conversation_counts(store_dir:str, days:int=None, end=None):
+    """
+    Loads comment counts per (user, conversation), either all-time or over a time window.
+
+    Parameters:
+    - store_dir (str): Directory of the engagement store.
+    - days (int): Length of the window in days, e.g. 30 for the last 30 days. All history if None.
+    - end (date-like): Last day of the window. Defaults to the latest aggregated day.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with 'user_id', 'conversation_id' and 'count' columns.
+    """
+    return _load_window(os.path.join(store_dir, 'user_conversation'), USER_CONVERSATION_KEYS, USER_CONVERSATION_VALUES, days=days, end=end)
+
+def load_article_engagement(store_dir:str, days:int=None, end=None):
+    """
+    Loads comment counts and like and view totals per article, either all-time or over a time window.
+
+    Parameters:
+    - store_dir (str): Directory of the engagement store.
+    - days (int): Length of the window in days, e.g. 30 for the last 30 days. All history if None.
+    - end (date-like): Last day of the window. Defaults to the latest aggregated day.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with 'conversation_id', 'n_comments', 'total_likes' and 'total_views' columns.
+    """
+    return _load_window(os.path.join(store_dir, 'article'), ARTICLE_KEYS, ARTICLE_VALUES, days=days, end=end)
@@ -0,0 +1,127 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sklearn.cluster import MiniBatchKMeans
+
+# fitted model shipped once to each worker process by _init_predict_worker
+_worker_topic_model = None
+
+
+def stratified_sample(embeddings:np.ndarray, sample_ratio:float, n_strata:int=50, random_state:int=42):
+    """
+    Draws a sample of documents stratified over coarse k-means clusters of their embeddings, so small regions of the
+    embedding space (and therefore small topics) are represented in proportion to their size.
+
+    Parameters:
+    - embeddings (np.ndarray): Document embeddings of shape (n_documents, dim).
+    - sample_ratio (float): Fraction of documents to sample from each stratum (at least one per stratum).
+    - n_strata (int): Number of k-means strata.
+    - random_state (int): Random seed.
+
+    Returns:
+    - np.ndarray: Sorted indices of the sampled documents.
+    """
+
+    n_docs = len(embeddings)
+    n_strata = min(n_strata, n_docs)
+    strata = MiniBatchKMeans(n_clusters=n_strata, random_state=random_state, n_init=3).fit_predict(embeddings)
+
+    # shuffle within each stratum, then keep the first quota rows of every stratum
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(n_docs), strata))
+    sorted_strata = strata[order]
+    rank = np.arange(n_docs) - np.searchsorted(sorted_strata, sorted_strata)
+    quota = np.ceil(sample_ratio * np.bincount(strata, minlength=n_strata))
+
+    return np.sort(order[rank < quota[sorted_strata]])
+
+def _init_predict_worker(topic_model):
+    """Stores the fitted model in a worker process so it is unpickled once per worker rather than once per chunk."""
+    global _worker_topic_model
+    _worker_topic_model = topic_model
+
+def _predict_chunk(documents:list, embeddings:np.ndarray):
+    """Assigns topics to one chunk of documents in a worker process."""
+    return _worker_topic_model.transform(documents, embeddings)
+
+def fit_predict_sampled(
+    topic_model,
+    documents:list,
+    embeddings:np.ndarray,
+    sample_ratio:float=0.1,
+    n_jobs:int=None,
+    chunk_size:int=10000,
+    n_strata:int=50,
+    random_state:int=42,
+    verbose=False):
+    """
+    Fits UMAP, HDBSCAN and c-TF-IDF on a stratified sample of the documents, then assigns the remaining documents in
+    parallel chunks with approximate prediction. The HDBSCAN model must be created with prediction_data=True.
+
+    Parameters:
+    - topic_model (BERTopic): Unfitted BERTopic model.
+    - documents (list): All documents to model.
+    - embeddings (np.ndarray): Precomputed embeddings for all documents.
+    - sample_ratio (float): Fraction of documents to fit on.
+    - n_jobs (int): Maximum number of worker processes for prediction. Defaults to the number of CPU cores.
+    - chunk_size (int): Maximum number of documents per prediction chunk. Each worker pays a fixed start-up cost (imports and
+      numba compilation of the UMAP transform), so a single chunk is predicted in-process.
+    - n_strata (int): Number of k-means strata used for sampling.
+    - random_state (int): Random seed for sampling.
+    - verbose (bool): If True, prints timing for each stage.
+
+    Returns:
+    - list: Topic of every document, in input order.
+    - np.ndarray: Topic probabilities of every document, in input order (None if the model returns none).
+    """
+
+    n_jobs = n_jobs or os.cpu_count()
+    documents = list(documents)
+    embeddings = np.asarray(embeddings)
+
+    # UMAP fit on fewer than 4096 points otherwise switches to exact search, whose transform is quadratic in python
+    if hasattr(topic_model.umap_model, 'force_approximation_algorithm'):
+        topic_model.umap_model.force_approximation_algorithm = True
+
+    start = time.perf_counter()
+    sample_idx = stratified_sample(embeddings, sample_ratio, n_strata=n_strata, random_state=random_state)
+    rest_idx = np.setdiff1d(np.arange(len(documents)), sample_idx, assume_unique=True)
+    print(f"\nfitting on a stratified sample of {len(sample_idx)} out of {len(documents)} documents...\n")
+
+    sample_topics, sample_probs = topic_model.fit_transform([documents[i] for i in sample_idx], embeddings[sample_idx])
+    if verbose:
+        print(f"sampled and fit in {time.perf_counter() - start:.2f}s")
+
+    n_chunks = int(np.ceil(len(rest_idx) / chunk_size))
+    chunks = np.array_split(rest_idx, n_chunks) if n_chunks else []
+    chunk_args = [([documents[i] for i in chunk], embeddings[chunk]) for chunk in chunks]
+
+    start = time.perf_counter()
+    if n_jobs == 1 or len(chunks) <= 1:
+        results = [topic_model.transform(*args) for args in chunk_args]
+    else:
+        with ProcessPoolExecutor(
+                max_workers=min(n_jobs, len(chunks)),
+                mp_context=get_context('spawn'),
+                initializer=_init_predict_worker,
+                initargs=(topic_model,)) as pool:
+            results = list(pool.map(_predict_chunk, *zip(*chunk_args)))
+    if verbose:
+        print(f"predicted {len(rest_idx)} documents in {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+
+    topics = np.empty(len(documents), dtype=int)
+    topics[sample_idx] = sample_topics
+    for chunk, (chunk_topics, _) in zip(chunks, results):
+        topics[chunk] = chunk_topics
+
+    probabilities = None
+    if sample_probs is not None:
+        sample_probs = np.asarray(sample_probs)
+        probabilities = np.zeros((len(documents),) + sample_probs.shape[1:], dtype=sample_probs.dtype)
+        probabilities[sample_idx] = sample_probs
+        for chunk, (_, chunk_probs) in zip(chunks, results):
+            probabilities[chunk] = chunk_probs
+
+    return topics.tolist(), probabilities
@@ -8,6 +8,9 @@ import sys
 from hdbscan import HDBSCAN
 from collections import defaultdict
 from utils.reader import read_cols
+from utils.keys import doc_key
+from src.embedders import ParallelSentenceEmbedder
+from src.sample_fit import fit_predict_sampled
 
 
 def compile_data(verbose=False):
@@ -26,7 +29,9 @@ def compile_data(verbose=False):
     comment_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=COMMENT_SHEET_NAME,
-        column_names=COMMENT_COLS)
+        column_names=COMMENT_COLS,
+        normalize_cols=COMMENT_NORMALIZE_COLS,
+        cache_dir=SHEET_CACHE_DIR)
 
     print("-------------------")
     print(f"comment_data['conversation_id'].nunique(): {comment_data['conversation_id'].nunique()}")
@@ -37,12 +42,15 @@ def compile_data(verbose=False):
     reaction_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=REACTION_SHEET_NAME,
-        column_names=REACTION_COLS)
+        column_names=REACTION_COLS,
+        cache_dir=SHEET_CACHE_DIR)
 
     article_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=ARTICLE_SHEET_NAME,
-        column_names=ARTICLE_COLS)
+        column_names=ARTICLE_COLS,
+        normalize_cols=ARTICLE_NORMALIZE_COLS,
+        cache_dir=SHEET_CACHE_DIR)
 
     print("\nmerging data...\n")
     compiled_df = comment_data \
@@ -53,37 +61,90 @@ def compile_data(verbose=False):
     
     return compiled_df['description'].unique().tolist()
 
+def top_k_topic_probabilities(topics, probabilities, top_k=3):
+    """
+    Reduces the topic probabilities returned by fit_transform to the k most likely topics per document, stored as k fixed-width
+    topic_i / prob_i column pairs (most likely first) instead of one column per topic. Unused slots hold topic -1 and probability 0.
+
+    Parameters:
+    - topics (list): Assigned topic of each document.
+    - probabilities (np.ndarray): Either the (n_documents, n_topics) probability matrix, one probability per document, or None.
+    - top_k (int): Number of topics to keep per document. Only the assigned topic is kept when the full matrix is not available.
+
+    Returns:
+    - pd.DataFrame: The topic_i (int16) and prob_i (float32) columns, aligned with the documents.
+    """
+
+    topics = np.asarray(topics)
+    if probabilities is None:
+        top_topics, top_probs = topics[:, None], np.full((len(topics), 1), np.nan)
+    elif np.ndim(probabilities) == 1:
+        top_topics, top_probs = topics[:, None], np.asarray(probabilities)[:, None]
+    else:
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        k = min(top_k, probabilities.shape[1])
+        top_topics = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]  # column j holds the probability of topic j
+        top_probs = np.take_along_axis(probabilities, top_topics, axis=1)
+        order = np.argsort(-top_probs, axis=1, kind='stable')
+        top_topics = np.take_along_axis(top_topics, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+        top_topics[top_probs <= 0] = -1
+
+    columns = {}
+    for i in range(top_topics.shape[1]):
+        columns[f'topic_{i + 1}'] = top_topics[:, i].astype(np.int16)
+        columns[f'prob_{i + 1}'] = top_probs[:, i].astype(np.float32)
+    return pd.DataFrame(columns)
+
+def write_doc_topic_artifact(doc_topic_df:pd.DataFrame, doc_topic_output_file_path:str):
+    """
+    Saves the doc-topic df as Parquet with compact integer types, sorted by doc_id so readers can join on (and filter by) the integer key.
+
+    Parameters:
+    - doc_topic_df (pd.DataFrame): DataFrame with 'doc_id', 'Topic', 'Document_description' and top-k topic_i / prob_i columns.
+    - doc_topic_output_file_path (str): Path to save the Parquet file.
+    """
+    doc_topic_df = doc_topic_df.astype({'doc_id': np.int64, 'Topic': np.int16}).sort_values(by='doc_id')
+    doc_topic_df.to_parquet(doc_topic_output_file_path, index=False)
+
 def run_topic_model(
     doc_summaries,
     n_topics=21,
     verbose=False,
+    embedding_model=None,
+    top_k=3,
     topic_summary_output_file_path='outputs/topic_summaries.csv',
-    doc_topic_output_file_path='outputs/doc_topic_df.csv'):
+    doc_topic_output_file_path='outputs/doc_topic_df.parquet',
+    model_output_path=None):
 
     """
-    Performs topic modeling using the BERTopic algorithm on a list of document summaries. Generates a specified number of topics, creates and saves two CSV files containing document topics and topic summaries.
+    Performs topic modeling using the BERTopic algorithm on a list of document summaries. Generates a specified number of topics, and saves the document topics as Parquet and the topic summaries as CSV.
 
     Parameters:
     - doc_summaries (list): List of document summaries to model.
     - n_topics (int): Number of topics to generate.
     - verbose (bool): If True, prints additional details about the process.
+    - embedding_model (BaseEmbedder): Embedding backend, e.g. a ParallelSentenceEmbedder. Defaults to BERTopic's single-process sentence-transformer.
+    - top_k (int): Number of most likely topics (with probabilities) to keep per document. Values above 1 make BERTopic compute the full topic probability matrix.
     - topic_summary_output_file_path (str): Path to save the topic summaries CSV file.
-    - doc_topic_output_file_path (str): Path to save the document topics CSV file.
+    - doc_topic_output_file_path (str): Path to save the document topics Parquet file.
+    - model_output_path (str): If given, the fitted model (without its embedding model) is saved here, e.g. for topic_trends.py.
 
     Outputs:
-    - Two CSV files: One containing a summary of topics and another detailing the topics assigned to each document.
+    - A CSV file containing a summary of topics, and a Parquet file detailing the topics assigned to each document, keyed by doc_id (a stable hash of the description) with the top-k topic probabilities.
     """
 
     print("\nPerforming topic modeling...\n")
 
     # initialize model
-    topic_model = BERTopic(nr_topics=n_topics)
+    topic_model = BERTopic(nr_topics=n_topics, embedding_model=embedding_model, calculate_probabilities=top_k > 1)
 
     # fit model
     topics, probabilities = topic_model.fit_transform(doc_summaries)
 
     # create doc topic df
-    doc_topic_df = pd.DataFrame({'Topic': topics, 'Document_description': doc_summaries})
+    doc_topic_df = pd.DataFrame({'doc_id': doc_key(doc_summaries), 'Topic': topics, 'Document_description': doc_summaries})
+    doc_topic_df = pd.concat([doc_topic_df, top_k_topic_probabilities(topics, probabilities, top_k=top_k)], axis=1)
 
     # look at the number of docs per topic
     print("\nNumbers per topic:")
@@ -104,10 +165,13 @@ def run_topic_model(
         print(topic_summary_df.head(5))
     
     # save to file
-    doc_topic_df.to_csv(doc_topic_output_file_path, index=False)
+    write_doc_topic_artifact(doc_topic_df, doc_topic_output_file_path)
     print(f"\nSaved doc-topic df to {doc_topic_output_file_path}\n")
     topic_summary_df.to_csv(topic_summary_output_file_path, index=False)
     print(f"\nSaved topic summaries to {topic_summary_output_file_path}")
+    if model_output_path is not None:
+        topic_model.save(model_output_path, save_embedding_model=False)
+        print(f"\nSaved topic model to {model_output_path}")
 
 class OpenAIEmbedder:
     """
@@ -119,6 +183,7 @@ class OpenAIEmbedder:
 
     Methods:
     - fit_transform(documents): Embeds a list of documents and returns their embeddings.
+    - embed(documents, verbose): Same as fit_transform, returned as an array.
     """
 
     def __init__(self, api_key, model):
@@ -145,6 +210,19 @@ class OpenAIEmbedder:
             embeddings.append(response['data']['embeddings'])
         return embeddings
 
+    def embed(self, documents, verbose=False):
+        """
+        Embeds documents and returns them as an array, matching the interface of BERTopic embedding backends.
+
+        Parameters:
+        - documents (list): List of documents to embed.
+        - verbose (bool): Not used.
+
+        Returns:
+        - np.ndarray: Array of shape (n_documents, dim).
+        """
+        return np.asarray(self.fit_transform(documents))
+
 def run_topic_model_openai(
     doc_summaries,
     n_topics=10,
@@ -154,11 +232,15 @@ def run_topic_model_openai(
     verbose=False,
     openai_embedder=None,
     model="text-embedding-3-large",
+    sample_ratio=None,
+    n_jobs=None,
+    top_k=3,
     topic_summary_output_file_path='outputs/topic_summaries.csv',
-    doc_topic_output_file_path='outputs/doc_topic_df.csv'):
+    doc_topic_output_file_path='outputs/doc_topic_df.parquet',
+    model_output_path=None):
 
     """
-    Performs topic modeling using OpenAI embeddings and HDBSCAN clustering. Saves the resulting document-topic mappings and topic summaries to CSV files.
+    Performs topic modeling using OpenAI embeddings and HDBSCAN clustering. Saves the resulting document-topic mappings to Parquet and topic summaries to CSV.
 
     Parameters:
     - doc_summaries (list): Document summaries to model.
@@ -169,11 +251,15 @@ def run_topic_model_openai(
     - verbose (bool): If True, prints detailed output about the process.
     - openai_embedder (OpenAIEmbedder): OpenAI embedder instance for generating embeddings.
     - model (str): OpenAI model to use for embeddings.
+    - sample_ratio (float): If set, fits UMAP, HDBSCAN and c-TF-IDF on a stratified sample of this fraction of the documents and assigns the rest with approximate prediction. Fits on every document if None.
+    - n_jobs (int): Number of worker processes used to assign the remaining documents when sample_ratio is set. Defaults to all cores.
+    - top_k (int): Number of most likely topics (with probabilities) to keep per document. Values above 1 make BERTopic compute the full topic probability matrix.
     - topic_summary_output_file_path (str): Path to save the topic summaries CSV file.
-    - doc_topic_output_file_path (str): Path to save the document topics CSV file.
+    - doc_topic_output_file_path (str): Path to save the document topics Parquet file.
+    - model_output_path (str): If given, the fitted model (without its embedding model) is saved here, e.g. for topic_trends.py.
 
     Outputs:
-    - Two CSV files: One for document-topic mappings, and another for topic summaries.
+    - A Parquet file of document-topic mappings keyed by doc_id with the top-k topic probabilities, and a CSV file of topic summaries.
     """
 
     print("\nPerforming topic modeling...\n")
@@ -182,7 +268,7 @@ def run_topic_model_openai(
     custom_hdbscan_model = HDBSCAN(min_cluster_size=min_topic_size, min_samples=min_samples_core_point, metric='euclidean', prediction_data=True)
     
     # Create BERTopic instance with custom OpenAI embedder
-    topic_model = BERTopic(hdbscan_model=custom_hdbscan_model, nr_topics=n_topics+1, low_memory=True, embedding_model=openai_embedder)
+    topic_model = BERTopic(hdbscan_model=custom_hdbscan_model, nr_topics=n_topics+1, low_memory=True, embedding_model=openai_embedder, calculate_probabilities=top_k > 1)
 
     # alt method
     # topic_model = BERTopic(
@@ -193,13 +279,25 @@ def run_topic_model_openai(
     #     nr_topics=n_topics+1)
 
     # fit model
-    topics, probabilities = topic_model.fit_transform(doc_summaries)
+    if sample_ratio is None:
+        topics, probabilities = topic_model.fit_transform(doc_summaries)
+    else:
+        embedder = openai_embedder if openai_embedder is not None else ParallelSentenceEmbedder()
+        embeddings = embedder.embed(doc_summaries)
+        topics, probabilities = fit_predict_sampled(
+            topic_model,
+            doc_summaries,
+            embeddings,
+            sample_ratio=sample_ratio,
+            n_jobs=n_jobs,
+            verbose=verbose)
 
     print("\nlength of topics:")
     print(len(topics))
 
     # create doc topic df
-    doc_topic_df = pd.DataFrame({'Topic': topics, 'Document_description': doc_summaries})
+    doc_topic_df = pd.DataFrame({'doc_id': doc_key(doc_summaries), 'Topic': topics, 'Document_description': doc_summaries})
+    doc_topic_df = pd.concat([doc_topic_df, top_k_topic_probabilities(topics, probabilities, top_k=top_k)], axis=1)
 
 
     # look at the number of docs per topic
@@ -215,6 +313,10 @@ def run_topic_model_openai(
     # create topic summary df
     topic_summary_df = topic_model.get_topic_info()  # This gives a summary of all topics
 
+    if sample_ratio is not None:
+        # the model only counted the sampled docs
+        topic_summary_df['Count'] = topic_summary_df['Topic'].map(topic_number_dict).fillna(0).astype(int)
+
     topic_summary_df = topic_summary_df[topic_summary_df['Count'] > 0]  # remove topics with no docs
     # topic_summary_df = topic_summary_df[topic_summary_df['Topic'] != -1]  # remove docs that don't belong to any topic
     if verbose:
@@ -222,15 +324,21 @@ def run_topic_model_openai(
         print(topic_summary_df.head(5))
     
     # save to file
-    doc_topic_df.to_csv(doc_topic_output_file_path, index=False)
+    write_doc_topic_artifact(doc_topic_df, doc_topic_output_file_path)
     print(f"\nSaved doc-topic df to {doc_topic_output_file_path}\n")
     topic_summary_df.to_csv(topic_summary_output_file_path, index=False)
     print(f"\nSaved topic summaries to {topic_summary_output_file_path}")
+    if model_output_path is not None:
+        topic_model.save(model_output_path, save_embedding_model=False)
+        print(f"\nSaved topic model to {model_output_path}")
 
 def topic_model_names_summaries(
     open_ai=False,
     api_key=None,
-    model="text-embedding-3-large"):
+    model="text-embedding-3-large",
+    n_embedding_workers=None,
+    embedding_backend='torch',
+    sample_ratio=None):
     """
     Orchestrates the topic modeling process using either OpenAI or BERTopic based on a flag. Retrieves data, performs topic modeling, and saves the outputs.
 
@@ -238,9 +346,12 @@ def topic_model_names_summaries(
     - open_ai (bool): Flag to determine if OpenAI's embedding model should be used.
     - api_key (str): API key for OpenAI.
     - model (str): The OpenAI model to use if open_ai is True.
+    - n_embedding_workers (int): Number of CPU worker processes for local sentence-transformer embeddings if open_ai is False. Defaults to all cores.
+    - embedding_backend (str): Local embedding backend if open_ai is False: 'torch', 'int8' or 'onnx'.
+    - sample_ratio (float): If open_ai is True, fit on a stratified sample of this fraction of the documents and predict the rest (see run_topic_model_openai).
 
     Outputs:
-    - CSV files containing document-topic mappings and topic summaries.
+    - A Parquet file containing document-topic mappings and a CSV file of topic summaries.
     """
 
     doc_summaries = compile_data()
@@ -253,21 +364,30 @@ def topic_model_names_summaries(
             doc_summaries=doc_summaries,
             n_topics=N_TOPICS,
             openai_embedder=openai_embedder,
+            sample_ratio=sample_ratio,
             topic_summary_output_file_path=TOPIC_SUMMARY_OUTPUT_FILE_PATH,
-            doc_topic_output_file_path=DOC_TOPIC_OUTPUT_FILE_PATH)
+            doc_topic_output_file_path=DOC_TOPIC_OUTPUT_FILE_PATH,
+            model_output_path=MODEL_OUTPUT_PATH)
     else:
+        embedding_model = ParallelSentenceEmbedder(n_workers=n_embedding_workers, backend=embedding_backend)
         run_topic_model(
             doc_summaries=doc_summaries,
             n_topics=N_TOPICS,
+            embedding_model=embedding_model,
             topic_summary_output_file_path=TOPIC_SUMMARY_OUTPUT_FILE_PATH,
-            doc_topic_output_file_path=DOC_TOPIC_OUTPUT_FILE_PATH)
+            doc_topic_output_file_path=DOC_TOPIC_OUTPUT_FILE_PATH,
+            model_output_path=MODEL_OUTPUT_PATH)
 
 if __name__ == "__main__":
     OPEN_AI = True
+    N_EMBEDDING_WORKERS = os.cpu_count()
+    EMBEDDING_BACKEND = 'torch'  # 'int8' or 'onnx' for faster CPU inference
+    SAMPLE_RATIO = None  # e.g. 0.1 to fit on a 10% stratified sample of large corpora
     EXCEL_FILE_PATH = "data/fox_news_comments.xlsx"
     N_TOPICS = 6
     TOPIC_SUMMARY_OUTPUT_FILE_PATH = "outputs/topic_summaries_filtered.csv"
-    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df_filtered.csv"
+    DOC_TOPIC_OUTPUT_FILE_PATH = "outputs/doc_topic_df_filtered.parquet"
+    MODEL_OUTPUT_PATH = "outputs/topic_model"  # fitted model, used by topic_trends.py
 
     ARTICLE_SHEET_NAME = "articles_data"
     COMMENT_SHEET_NAME = "comments_for_published_articles"
@@ -276,6 +396,11 @@ if __name__ == "__main__":
     COMMENT_COLS = ['conversation_id', 'conv_message_id', 'author_id', 'written_date', 'text_content', 'final_state']
     ARTICLE_COLS = ['title', 'published_date', 'description', 'canonical_url', 'conversation_id', 'thumbnail_url'] #[article_thumbnail_alt_text, article_text, article_author]
     REACTION_COLS = [ 'message_id', 'total_views', 'total_likes']
+
+    # text columns normalised on read, and the Parquet cache of the sheets (with their normalised columns)
+    ARTICLE_NORMALIZE_COLS = ['title', 'description']
+    COMMENT_NORMALIZE_COLS = ['text_content']
+    SHEET_CACHE_DIR = "data/cache"
     
     dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
     load_dotenv(dotenv_path) # Load environment variables
@@ -284,4 +409,7 @@ if __name__ == "__main__":
     topic_model_names_summaries(
         open_ai=OPEN_AI,
         api_key=API_KEY, 
-        model="text-embedding-3-large")
+        model="text-embedding-3-large",
+        n_embedding_workers=N_EMBEDDING_WORKERS,
+        embedding_backend=EMBEDDING_BACKEND,
+        sample_ratio=SAMPLE_RATIO)
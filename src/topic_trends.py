@@ -0,0 +1,218 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+from bertopic import BERTopic
+from src.engagement import comments_filter, update_article_engagement
+from utils.keys import doc_key
+from utils.partitions import list_partitions, partition_path, read_partitions, write_partition
+from utils.reader import read_cols, read_doc_topics
+
+ENGAGEMENT_COLS = ['n_comments', 'total_likes', 'total_views']
+
+
+def bin_start(dates:pd.Series, freq:str='W'):
+    """
+    Maps timestamps to the first day of their bin: the day itself for freq 'D', or the Monday of the week for freq 'W'.
+    """
+    dates = pd.to_datetime(dates, errors='coerce', format='mixed')
+    if freq == 'D':
+        return dates.dt.normalize()
+    if freq == 'W':
+        return dates.dt.to_period('W').dt.start_time
+    raise ValueError(f"Unknown bin frequency '{freq}', expected 'D' or 'W'")
+
+def fitted_ctfidf(topic_model:BERTopic):
+    """
+    Returns the c-TF-IDF transformer fitted with the model (ctfidf_model in recent BERTopic versions, transformer in older ones).
+    """
+    ctfidf = getattr(topic_model, 'ctfidf_model', None)
+    return ctfidf if ctfidf is not None else topic_model.transformer
+
+def stale_bins(root:str, engagement_root:str, freq:str='W'):
+    """
+    Finds the trend bins whose engagement changed since they were written: bins with an engagement partition (a day) that
+    was rewritten after (or in the same second as, for coarse file timestamps) the bin's own partition, e.g. by the
+    engagement store's refresh of its latest days.
+
+    Parameters:
+    - root (str): Directory of the trend partitions for freq.
+    - engagement_root (str): Directory of the per-article engagement partitions.
+    - freq (str): 'D' or 'W'.
+
+    Returns:
+    - set: Start dates of the stale bins.
+    """
+
+    days = list_partitions(engagement_root)
+    if not days:
+        return set()
+    bins = bin_start(pd.Series(days, dtype='datetime64[ns]'), freq)
+    return {
+        b for day, b in zip(days, bins)
+        if os.path.exists(partition_path(root, b))
+        and os.path.getmtime(partition_path(engagement_root, day)) >= os.path.getmtime(partition_path(root, b))}
+
+def bin_keywords(vectorizer_model, ctfidf_model, articles:pd.DataFrame, n_words:int=10):
+    """
+    Computes the top c-TF-IDF keywords of each topic within each time bin, using the vocabulary and IDF weights fitted with the
+    model, so keywords are comparable across bins and nothing is refitted. c-TF-IDF weights each (bin, topic) row on its own,
+    so all bins are scored with a single transform rather than one per bin.
+
+    Parameters:
+    - vectorizer_model (CountVectorizer): The fitted vectorizer of the topic model.
+    - ctfidf_model: The fitted c-TF-IDF transformer of the topic model.
+    - articles (pd.DataFrame): Articles with 'bin', 'Topic' and 'description' columns.
+    - n_words (int): Number of keywords to keep per topic and bin.
+
+    Returns:
+    - pd.DataFrame: One row per (bin, topic) with its keywords (most relevant first).
+    """
+
+    documents = articles.groupby(['bin', 'Topic'])['description'].apply(' '.join)
+    if documents.empty:
+        return pd.DataFrame(columns=['bin', 'Topic', 'keywords'])
+    c_tf_idf = ctfidf_model.transform(vectorizer_model.transform(documents.values)).tocsr()
+    words = vectorizer_model.get_feature_names_out()
+
+    keywords = []
+    for i in range(c_tf_idf.shape[0]):
+        indices = c_tf_idf.indices[c_tf_idf.indptr[i]:c_tf_idf.indptr[i + 1]]
+        data = c_tf_idf.data[c_tf_idf.indptr[i]:c_tf_idf.indptr[i + 1]]
+        keywords.append(words[indices[np.argsort(-data, kind='stable')[:n_words]]].tolist())
+
+    return documents.index.to_frame(index=False).assign(keywords=keywords)
+
+def update_topic_trends(
+    topic_model:BERTopic,
+    article_data:pd.DataFrame,
+    doc_topic_df:pd.DataFrame,
+    engagement_store_dir:str,
+    trends_dir:str,
+    freq:str='W',
+    n_words:int=10,
+    refresh_bins:int=1,
+    recompute:bool=False):
+    """
+    Computes per-topic trend tables for each day or week: the number of articles published, the comments, likes and views
+    written on the topic's articles, and the topic's c-TF-IDF keywords among the articles published in that bin. Topics come
+    from the already-fitted model and the doc-topic output, so nothing is refitted. Each bin is written as its own Parquet
+    partition and only bins without a partition, bins whose engagement partitions were rewritten since (see stale_bins) and
+    the latest refresh_bins (which may have been missing articles) are computed.
+
+    Parameters:
+    - topic_model (BERTopic): The fitted topic model (see topic_model.py's model_output_path).
+    - article_data (pd.DataFrame): Articles with 'published_date', 'description' and 'conversation_id' columns.
+    - doc_topic_df (pd.DataFrame): Doc-topic output with 'doc_id' and 'Topic' columns.
+    - engagement_store_dir (str): Directory of the engagement store (see engagement.py).
+    - trends_dir (str): Directory to write the trend tables to.
+    - freq (str): 'D' for daily bins or 'W' for weekly bins.
+    - n_words (int): Number of keywords per topic and bin.
+    - refresh_bins (int): Number of latest existing bins to recompute, in addition to the stale ones.
+    - recompute (bool): If True, recomputes every bin, e.g. after the topic model was refitted.
+
+    Returns:
+    - pd.DataFrame: The trend table over all bins, one row per (bin, topic).
+    """
+
+    root = os.path.join(trends_dir, f"freq={freq}")
+
+    # topic and bin of every article
+    articles = article_data.assign(doc_id=doc_key(article_data['description'])) \
+        .merge(doc_topic_df[['doc_id', 'Topic']], how='inner', on='doc_id')
+    articles['bin'] = bin_start(articles['published_date'], freq)
+    articles = articles.dropna(subset=['bin']).astype({'Topic': int})
+    convo_topic = articles.drop_duplicates(subset='conversation_id').set_index('conversation_id')['Topic']
+
+    # pick the bins to (re)compute from the articles and the days in the engagement store
+    engagement_root = os.path.join(engagement_store_dir, 'article')
+    all_bins = set(articles['bin']) | set(bin_start(pd.Series(list_partitions(engagement_root), dtype='datetime64[ns]'), freq))
+    existing = list_partitions(root)
+    refresh = (set(existing[-refresh_bins:]) if refresh_bins else set()) | stale_bins(root, engagement_root, freq)
+    new_bins = sorted(b for b in all_bins if recompute or b not in existing or b in refresh)
+    print(f"\ncomputing {len(new_bins)} of {len(all_bins)} topic trend bins...\n")
+
+    if new_bins:
+        new_articles = articles[articles['bin'].isin(new_bins)]
+        counts = new_articles.groupby(['bin', 'Topic']).size().rename('n_articles')
+
+        # engagement is binned by the day the comments were written
+        bin_end = new_bins[-1] + (pd.Timedelta(days=1) if freq == 'D' else pd.Timedelta(days=7)) - pd.Timedelta(days=1)
+        engagement = read_partitions(engagement_root, start=new_bins[0], end=bin_end, columns=['conversation_id'] + ENGAGEMENT_COLS)
+        engagement['Topic'] = engagement['conversation_id'].map(convo_topic)
+        engagement['bin'] = bin_start(engagement['date'], freq)
+        engagement = engagement[engagement['bin'].isin(new_bins)].dropna(subset=['Topic']).astype({'Topic': int})
+        engagement = engagement.groupby(['bin', 'Topic'])[ENGAGEMENT_COLS].sum()
+
+        trends = pd.concat([counts, engagement], axis=1).fillna(0).astype(np.int64).reset_index()
+
+        # keywords of every (bin, topic) in one pass
+        keywords = bin_keywords(topic_model.vectorizer_model, fitted_ctfidf(topic_model), new_articles, n_words)
+        trends = trends.merge(keywords, how='left', on=['bin', 'Topic'])
+        trends['keywords'] = trends['keywords'].apply(lambda words: words if isinstance(words, list) else [])
+        for b in new_bins:
+            write_partition(trends[trends['bin'] == b].drop(columns='bin'), root, b)
+
+    trends = read_partitions(root).rename(columns={'date': 'bin'})
+    trends.to_parquet(os.path.join(trends_dir, f"topic_trends_{freq}.parquet"), index=False)
+    print(f"\nSaved topic trends to {trends_dir}")
+    return trends
+
+
+if __name__ == "__main__":
+    """
+    Main execution block that loads the fitted topic model and its doc-topic output, brings the per-article engagement store up
+    to date with the comments it doesn't have yet, and updates the weekly topic trend tables. Run topic_model.py (with
+    MODEL_OUTPUT_PATH set) first, so the model and the doc-topic output exist.
+    """
+    FREQ = 'W'  # 'D' for daily bins
+    N_WORDS = 10
+    RECOMPUTE = False  # set to True after refitting the topic model, to recompute every bin
+
+    EXCEL_FILE_PATH = "data/fox_news_comments.xlsx"
+    ARTICLE_SHEET_NAME = "articles_data"
+    COMMENT_SHEET_NAME = "comments_for_published_articles"
+    REACTION_SHEET_NAME = "reaction_count_for_pub_articles"
+    ARTICLE_COLS = ['title', 'published_date', 'description', 'canonical_url', 'conversation_id', 'thumbnail_url']
+    ARTICLE_NORMALIZE_COLS = ['title', 'description']  # must match topic_model.py so doc_ids line up
+    SHEET_CACHE_DIR = "data/cache"
+    MODEL_PATH = "outputs/topic_model"
+    DOC_TOPIC_DF = "outputs/doc_topic_df_filtered.parquet"
+    ENGAGEMENT_STORE_DIR = "outputs/engagement"
+    TRENDS_DIR = "outputs/topic_trends"
+
+    topic_model = BERTopic.load(MODEL_PATH)
+    article_data = read_cols(
+        excel_file_path=EXCEL_FILE_PATH,
+        sheet_name=ARTICLE_SHEET_NAME,
+        column_names=ARTICLE_COLS,
+        normalize_cols=ARTICLE_NORMALIZE_COLS,
+        cache_dir=SHEET_CACHE_DIR)
+    doc_topic_df = read_doc_topics(DOC_TOPIC_DF, columns=['doc_id', 'Topic'])
+
+    # only the comments (and their reactions) of the days the engagement store still needs are read
+    comment_data = read_cols(
+        excel_file_path=EXCEL_FILE_PATH,
+        sheet_name=COMMENT_SHEET_NAME,
+        column_names=['conversation_id', 'conv_message_id', 'written_date', 'final_state'],
+        cache_dir=SHEET_CACHE_DIR,
+        filters=comments_filter(ENGAGEMENT_STORE_DIR, 'article'))
+    comment_data = comment_data[comment_data['final_state'] != 'blocked']  # as in topics_spreadsheet.py
+    reaction_data = read_cols(
+        excel_file_path=EXCEL_FILE_PATH,
+        sheet_name=REACTION_SHEET_NAME,
+        column_names=['message_id', 'total_views', 'total_likes'],
+        cache_dir=SHEET_CACHE_DIR,
+        filters=pc.field('message_id').isin(comment_data['conv_message_id'].unique()))
+    update_article_engagement(comment_data, reaction_data, ENGAGEMENT_STORE_DIR)
+
+    trends = update_topic_trends(
+        topic_model,
+        article_data,
+        doc_topic_df,
+        ENGAGEMENT_STORE_DIR,
+        TRENDS_DIR,
+        freq=FREQ,
+        n_words=N_WORDS,
+        recompute=RECOMPUTE)
+    print(trends.tail(10))
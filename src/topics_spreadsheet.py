@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
 from collections import defaultdict
-from utils.reader import read_cols
+from utils.reader import read_cols, read_doc_topics
+from utils.keys import doc_key
+from src.engagement import update_article_engagement, load_article_engagement
 
 
 def compile_data(verbose=False):
@@ -21,7 +23,9 @@ def compile_data(verbose=False):
     comment_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=COMMENT_SHEET_NAME,
-        column_names=COMMENT_COLS)
+        column_names=COMMENT_COLS,
+        normalize_cols=COMMENT_NORMALIZE_COLS,
+        cache_dir=SHEET_CACHE_DIR)
 
     print("-------------------")
     print(f"comment_data['conversation_id'].nunique(): {comment_data['conversation_id'].nunique()}")
@@ -32,14 +36,23 @@ def compile_data(verbose=False):
     reaction_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=REACTION_SHEET_NAME,
-        column_names=REACTION_COLS)
+        column_names=REACTION_COLS,
+        cache_dir=SHEET_CACHE_DIR)
 
     article_data = read_cols(
         excel_file_path=EXCEL_FILE_PATH,
         sheet_name=ARTICLE_SHEET_NAME,
-        column_names=ARTICLE_COLS)
-    
-    doc_topic_df = pd.read_csv(DOC_TOPIC_DF)
+        column_names=ARTICLE_COLS,
+        normalize_cols=ARTICLE_NORMALIZE_COLS,
+        cache_dir=SHEET_CACHE_DIR)
+
+    # merge new days of per-article comment, like and view totals into the engagement store, which is only read when
+    # ranking articles over a window
+    if WINDOW_DAYS is not None:
+        update_article_engagement(comment_data, reaction_data, ENGAGEMENT_STORE_DIR)
+
+    doc_topic_df = read_doc_topics(DOC_TOPIC_DF, columns=['doc_id', 'Topic'])
+    article_data['doc_id'] = doc_key(article_data['description'])
     if verbose:
         print("\nchecking for missing values and duplicates in doc topic...\n")
         print(doc_topic_df.isna().sum())
@@ -49,7 +62,7 @@ def compile_data(verbose=False):
     compiled_df = comment_data \
         .merge(reaction_data, how='right', left_on='conv_message_id', right_on='message_id') \
         .merge(article_data, how='left', on='conversation_id') \
-        .merge(doc_topic_df, how='left', left_on='description', right_on='Document_description')
+        .merge(doc_topic_df, how='left', on='doc_id')
     
     # compiled_df.to_csv('intermediate.csv', index=False)
     if verbose:
@@ -68,10 +81,10 @@ def compile_data(verbose=False):
         print(f"Overlap between 'conversation_id' in comment_data and 'conversation_id' in article_data: {overlap2}")
 
         print("comparison 3")
-        article_desc = set(article_data['description'].unique())
-        doc_topic_desc = set(doc_topic_df['Document_description'].unique())
-        overlap3 = len(article_desc.intersection(doc_topic_desc))
-        print(f"Overlap between 'description' in article_data and 'Document_description' in doc_topic_df: {overlap3}")
+        article_doc_ids = set(article_data['doc_id'].unique())
+        doc_topic_doc_ids = set(doc_topic_df['doc_id'].unique())
+        overlap3 = len(article_doc_ids.intersection(doc_topic_doc_ids))
+        print(f"Overlap between 'doc_id' in article_data and 'doc_id' in doc_topic_df: {overlap3}")
 
         print("-------------------")
 
@@ -95,7 +108,7 @@ def compile_data(verbose=False):
     compiled_df['total_views'] = compiled_df['total_views'].fillna(0).astype(float).round().astype(int)
     compiled_df['Topic'] = compiled_df['Topic'].astype(int)
 
-    compiled_df.drop(columns=['Document_description'], inplace=True)
+    compiled_df.drop(columns=['doc_id'], inplace=True)
 
     compiled_df = compiled_df[[
         'title',
@@ -116,7 +129,7 @@ def compile_data(verbose=False):
     
     return compiled_df
 
-def get_top_articles_df(compiled_df:pd.DataFrame):
+def get_top_articles_df(compiled_df:pd.DataFrame, article_engagement:pd.DataFrame=None):
     """
     Filters the compiled DataFrame to get the top articles based on likes within each topic. It further extracts the top comments
     for these articles based on likes, ensuring only comments linked to top articles are considered. Assumes articles and comments
@@ -124,6 +137,10 @@ def get_top_articles_df(compiled_df:pd.DataFrame):
 
     Parameters:
     - compiled_df (pd.DataFrame): The DataFrame containing combined article and comment data.
+    - article_engagement (pd.DataFrame): Optional per-article totals from the engagement store (see load_article_engagement), used to
+      rank the top N_ARTICLES distinct articles per topic by their summed likes within a time window. The stored likes of days older than
+      the store's refresh_days are snapshots from when the day was last aggregated, so they can lag the current reaction data. If None,
+      the N_ARTICLES most liked comment rows per topic are taken, from the current reaction data.
 
     Returns:
     - DataFrame: A DataFrame containing the sorted top comments for top articles organized by topic and likes.
@@ -132,7 +149,13 @@ def get_top_articles_df(compiled_df:pd.DataFrame):
     print("\nfiltering to top comments")
 
     # Sort by 'Topic' and 'total_likes', and get the top 10 articles per topic
-    top_articles_df = compiled_df.sort_values(by=['Topic', 'total_likes'], ascending=[True, False])
+    if article_engagement is not None:
+        top_articles_df = compiled_df[['Topic', 'conversation_id']].drop_duplicates() \
+            .merge(article_engagement[['conversation_id', 'total_likes']], how='left', on='conversation_id')
+        top_articles_df['total_likes'] = top_articles_df['total_likes'].fillna(0)
+        top_articles_df = top_articles_df.sort_values(by=['Topic', 'total_likes'], ascending=[True, False])
+    else:
+        top_articles_df = compiled_df.sort_values(by=['Topic', 'total_likes'], ascending=[True, False])
     top_articles_df = top_articles_df.groupby('Topic').head(N_ARTICLES)
 
     # Filter to keep only comments (assuming comments have a 'conversation_id')
@@ -248,7 +271,8 @@ def create_topics_spreadsheet():
     """
 
     compiled_df = compile_data(verbose=VERBOSE)
-    top_comments_df_sorted = get_top_articles_df(compiled_df)
+    article_engagement = load_article_engagement(ENGAGEMENT_STORE_DIR, days=WINDOW_DAYS) if WINDOW_DAYS is not None else None
+    top_comments_df_sorted = get_top_articles_df(compiled_df, article_engagement)
     write_to_excel(top_comments_df_sorted)
 
 
@@ -262,7 +286,7 @@ if __name__ == "__main__":
     N_COMMENTS=4
     VERBOSE = True
     
-    DOC_TOPIC_DF="outputs/doc_topic_df_filtered.csv"
+    DOC_TOPIC_DF="outputs/doc_topic_df_filtered.parquet"
     EXCEL_FILE_PATH = "data/fox_news_comments.xlsx"
     ARTICLE_SHEET_NAME = "articles_data"
     COMMENT_SHEET_NAME = "comments_for_published_articles"
@@ -273,6 +297,16 @@ if __name__ == "__main__":
     REACTION_COLS = [ 'message_id', 'total_views', 'total_likes']
     ARTICLE_COLS = ['title', 'published_date', 'description', 'canonical_url', 'conversation_id', 'thumbnail_url']
 
+    # text columns normalised on read (must match topic_model.py so doc_ids line up), and the Parquet cache of the sheets
+    ARTICLE_NORMALIZE_COLS = ['title', 'description']
+    COMMENT_NORMALIZE_COLS = ['text_content']
+    SHEET_CACHE_DIR = "data/cache"
+
+    # date-partitioned engagement aggregates, and the window (in days) used to rank articles by their likes in the store;
+    # None keeps ranking by the current likes of each comment row
+    ENGAGEMENT_STORE_DIR = 'outputs/engagement'
+    WINDOW_DAYS = None
+
     # output path for the final Excel file
     TOPICS_SPREADSHEET_OUTPUT_FILE_PATH = 'outputs/top_comments_df_sorted.csv'
 
@@ -1,5 +1,6 @@
 import pandas as pd
 from utils.reader import read_cols
+from src.engagement import comments_filter, update_user_conversation_counts, load_user_conversation_counts
 
 
 def get_most_engaged():
@@ -7,25 +8,28 @@ def get_most_engaged():
     Identifies the most engaged conversations and topics for users based on comment activity. It ranks conversations by engagement
     within each user and maps conversations to topics, filtering to keep only those with a valid topic. The function then matches users
     to their most engaged topics, and checks the percentage of users with engagements in conversations that have topics assigned.
+    Comment counts come from the date-partitioned engagement store, so only the comments of days not aggregated yet are read and
+    counted on each run, and engagement can be limited to the last WINDOW_DAYS days.
 
     Outputs:
     - Prints the top conversations per user, the top topics per user, and the percentage of users engaged in conversations without assigned topics.
     """
 
-    # get conversation with most engaged comments
+    # get conversation with most engaged comments, reading only the comments the engagement store still needs
     comment_data = read_cols(
             excel_file_path=RAW_FILE_PATH,
             sheet_name='comments_history',
-            column_names=['user_id', 'conversation_id', 'message_id'])
-    
-    top_convos = comment_data.groupby(['user_id','conversation_id']).size().sort_values(ascending=False).reset_index()
-    print("\nview top convos")
-    print(top_convos)
+            column_names=['user_id', 'conversation_id', 'message_id', 'written_date'],
+            cache_dir=SHEET_CACHE_DIR,
+            filters=comments_filter(ENGAGEMENT_STORE_DIR, 'user_conversation'))
 
-    conversation_counts = comment_data.groupby(['user_id', 'conversation_id']).size()
+    # merge new days into the engagement store, then read the counts for the requested window
+    update_user_conversation_counts(comment_data, ENGAGEMENT_STORE_DIR)
+    conversation_counts = load_user_conversation_counts(ENGAGEMENT_STORE_DIR, days=WINDOW_DAYS)
 
-    # Convert the series to a DataFrame and name the column
-    conversation_counts = conversation_counts.reset_index(name='count')
+    top_convos = conversation_counts.sort_values(by='count', ascending=False).reset_index(drop=True)
+    print("\nview top convos")
+    print(top_convos)
 
     # Sort the values by 'user_id' and 'count' in descending order to prepare for ranking
     conversation_counts.sort_values(by=['user_id', 'count'], ascending=[True, False], inplace=True)
@@ -81,9 +85,12 @@ if __name__ == "__main__":
     # configuration of paths and verbose flag
     VERBOSE = True
     RAW_FILE_PATH = "data/fox_news_comments.xlsx"
+    SHEET_CACHE_DIR = "data/cache"  # Parquet cache of the Excel sheets
     USER_SHEET_NAME = 'random_user_id_list_data'
     USER_COLS = ['country', 'city', 'region', 'is_registered', 'registration_date', 'registred_user_id']
     COMMENT_FILE_PATH = "outputs/top_comments_df_sorted.xlsx"
+    ENGAGEMENT_STORE_DIR = "outputs/engagement"
+    WINDOW_DAYS = None  # e.g. 30 to only count the last 30 days of comments
 
     # execute function to get most engaged users and their topics
     get_most_engaged()
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+
+def doc_key(values):
+    """
+    Computes a stable 64-bit integer key for each value (e.g. a document description or conversation id). The key is a
+    content hash, so the same text always maps to the same key across runs, machines and output files, which lets
+    artifacts be joined with integer hash joins instead of string equality.
+
+    Parameters:
+    - values (list | pd.Series | np.ndarray): Values to hash. Non-string values are converted to strings first.
+
+    Returns:
+    - np.ndarray: An int64 array of keys, aligned with the input.
+    """
+
+    values = pd.Series(values, copy=False).astype(str)
+    hashed = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return hashed.view(np.int64)
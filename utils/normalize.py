@@ -0,0 +1,97 @@
+import os
+import html
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ThreadPoolExecutor
+
+# changes with every change to this module, so normalised text cached by utils.reader is rebuilt under the new rules
+with open(__file__, 'rb') as f:
+    NORMALIZER_VERSION = hashlib.sha256(f.read()).hexdigest()[:12]
+
+# control characters (except tab/newline, which are whitespace) and zero-width characters
+INVISIBLE_CHARS = r'[\x00-\x08\x0e-\x1f\x7f\x{200b}-\x{200d}\x{2060}\x{feff}]'
+# runs of whitespace left after NFKC (which folds most Unicode spaces to ' '); single ' ' are not matched, as rewriting
+# every space between words would make this the slowest step
+WHITESPACE_RUNS = r'[\t\n\x0b\f\r \x{85}\x{1680}\x{2028}\x{2029}]{2,}|[\t\n\x0b\f\r\x{85}\x{1680}\x{2028}\x{2029}]'
+
+# the entities found in scraped comments, decoded with vectorised replaces; '&amp;' goes last so '&amp;lt;' becomes '&lt;'
+COMMON_ENTITIES = [('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#39;', "'"), ('&#x27;', "'"), ('&nbsp;', '\u00a0'), ('&amp;', '&')]
+COMMON_ENTITY = '|'.join(entity for entity, _ in COMMON_ENTITIES)
+
+
+def decode_entities(arr:pa.Array):
+    """
+    Decodes the HTML entities of an Arrow string array. Rows with any '&' other than COMMON_ENTITIES (e.g. '&copy;' or
+    '&#8217;') are decoded with html.unescape; the COMMON_ENTITIES of the other rows are replaced with vectorised kernels.
+    Each row goes through exactly one of the two, so '&amp;lt;' decodes to '&lt;' either way.
+    """
+    other_entity = pc.match_substring(pc.replace_substring_regex(arr, COMMON_ENTITY, ''), '&')
+    common_only = pc.invert(other_entity)
+
+    if pc.any(common_only).as_py():
+        common = pc.filter(arr, common_only)
+        for entity, char in COMMON_ENTITIES:
+            common = pc.replace_substring(common, entity, char)
+        decoded = pc.replace_with_mask(arr, common_only, common)
+    else:
+        decoded = arr
+    if pc.any(other_entity).as_py():
+        unescaped = pa.array([html.unescape(text) for text in pc.filter(arr, other_entity).to_pylist()], type=arr.type)
+        decoded = pc.replace_with_mask(decoded, other_entity, unescaped)
+    return decoded
+
+def normalize_array(arr:pa.Array):
+    """
+    Normalises an Arrow string array: decodes HTML entities, applies Unicode NFKC normalisation (which also folds
+    full-width characters, ligatures and non-breaking spaces), removes control and zero-width characters, collapses runs
+    of whitespace to one space and trims both ends. Each step runs as Arrow compute kernels, and entity decoding and NFKC
+    only touch the rows that contain '&' or non-ASCII characters respectively.
+
+    Parameters:
+    - arr (pa.Array): String array to normalise.
+
+    Returns:
+    - pa.Array: The normalised string array.
+    """
+
+    has_amp = pc.fill_null(pc.match_substring(arr, '&'), False)
+    if pc.any(has_amp).as_py():
+        arr = pc.replace_with_mask(arr, has_amp, decode_entities(pc.filter(arr, has_amp)))
+
+    # NFKC leaves ASCII unchanged, so only the other rows are normalised
+    non_ascii = pc.fill_null(pc.invert(pc.string_is_ascii(arr)), False)
+    if pc.any(non_ascii).as_py():
+        arr = pc.replace_with_mask(arr, non_ascii, pc.utf8_normalize(pc.filter(arr, non_ascii), form='NFKC'))
+    arr = pc.replace_substring_regex(arr, INVISIBLE_CHARS, '')
+    arr = pc.replace_substring_regex(arr, WHITESPACE_RUNS, ' ')
+    return pc.utf8_trim_whitespace(arr)
+
+def normalize_text(series:pd.Series, n_jobs:int=None, chunk_size:int=200000):
+    """
+    Normalises a column of text (see normalize_array) in chunks spread over a thread pool. Arrow compute kernels release
+    the GIL, so threads use every core without copying the data to worker processes.
+
+    Parameters:
+    - series (pd.Series): Text column to normalise.
+    - n_jobs (int): Number of threads. Defaults to the number of CPU cores.
+    - chunk_size (int): Number of rows per chunk.
+
+    Returns:
+    - pd.Series: The normalised column, with the same index.
+    """
+
+    n_jobs = n_jobs or os.cpu_count()
+    arr = pa.array(series.to_numpy(dtype=object), type=pa.large_string(), from_pandas=True)
+    chunks = [arr.slice(start, chunk_size) for start in range(0, len(arr), chunk_size)]
+
+    if n_jobs == 1 or len(chunks) <= 1:
+        normalized = [normalize_array(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            normalized = list(pool.map(normalize_array, chunks))
+
+    values = pa.concat_arrays(normalized).to_numpy(zero_copy_only=False) if normalized else np.array([], dtype=object)
+    return pd.Series(values, index=series.index, name=series.name)
@@ -0,0 +1,63 @@
+import os
+import pandas as pd
+
+PARTITION_PREFIX = 'date='
+
+
+def partition_path(root:str, date):
+    """
+    Returns the Parquet file path of the partition for a given date, e.g. root/date=2024-05-01/part.parquet.
+    """
+    return os.path.join(root, f"{PARTITION_PREFIX}{pd.Timestamp(date):%Y-%m-%d}", 'part.parquet')
+
+def list_partitions(root:str):
+    """
+    Lists the dates of all partitions written under a directory.
+
+    Parameters:
+    - root (str): Partitioned dataset directory.
+
+    Returns:
+    - list: Sorted list of partition dates as pd.Timestamp.
+    """
+
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        pd.Timestamp(name[len(PARTITION_PREFIX):])
+        for name in os.listdir(root)
+        if name.startswith(PARTITION_PREFIX) and os.path.exists(os.path.join(root, name, 'part.parquet')))
+
+def write_partition(df:pd.DataFrame, root:str, date):
+    """
+    Writes (or overwrites) the partition for a date. The file is written to a temporary path and moved into place so
+    readers never see a half-written partition.
+    """
+    path = partition_path(root, date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+def read_partitions(root:str, start=None, end=None, columns:list=None):
+    """
+    Reads and concatenates the partitions whose date falls in [start, end].
+
+    Parameters:
+    - root (str): Partitioned dataset directory.
+    - start (date-like): First date to include. Defaults to the first partition.
+    - end (date-like): Last date to include. Defaults to the last partition.
+    - columns (list): Columns to read. Defaults to all.
+
+    Returns:
+    - pd.DataFrame: The concatenated partitions, with a 'date' column holding each row's partition date.
+    """
+
+    dates = [
+        date for date in list_partitions(root)
+        if (start is None or date >= pd.Timestamp(start)) and (end is None or date <= pd.Timestamp(end))]
+    if not dates:
+        return pd.DataFrame(columns=(columns or []) + ['date'])
+
+    return pd.concat(
+        [pd.read_parquet(partition_path(root, date), columns=columns).assign(date=date) for date in dates],
+        ignore_index=True)
@@ -1,35 +1,134 @@
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.normalize import NORMALIZER_VERSION, normalize_text
+
+NORMALIZED_SUFFIX = '__normalized'
+
+def _normalized_name(column_name:str):
+    """Returns the cache column of a normalised column, tagged with the normaliser version so rule changes invalidate it."""
+    return f"{column_name}{NORMALIZED_SUFFIX}_{NORMALIZER_VERSION}"
+
+def _clean_cols(df:pd.DataFrame):
+    """Replaces NaN values with 'missing' and converts every column to strings."""
+    for column_name in df.columns:
+        df[column_name] = df[column_name].fillna('missing').astype(str)
+    return df
+
+def _write_cache(df:pd.DataFrame, cache_path:str):
+    """Writes the cached sheet to a temporary file and moves it into place so readers never see a half-written cache."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    df.to_parquet(cache_path + '.tmp', index=False)
+    os.replace(cache_path + '.tmp', cache_path)
+
+def _read_cached_cols(
+    excel_file_path:str,
+    sheet_name:str,
+    column_names:list,
+    normalize_cols:list,
+    cache_dir:str,
+    n_jobs:int=None,
+    filters=None
+):
+    """
+    Reads columns from the Parquet cache of a sheet. The whole sheet is cached (cleaned) the first time it is read or
+    whenever the Excel file is newer than the cache, and normalised copies of columns are added to the cache as
+    '<column>__normalized_<NORMALIZER_VERSION>' the first time they are requested, so each column is normalised once per
+    version of the data and of the normalisation rules. Normalised columns of older rule versions are dropped. Rows not
+    matching filters are skipped by the Parquet reader.
+    """
+
+    workbook_name = os.path.splitext(os.path.basename(excel_file_path))[0]
+    cache_path = os.path.join(cache_dir, workbook_name, f"{sheet_name}.parquet")
+
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(excel_file_path):
+        cached_cols = pq.read_schema(cache_path).names
+        sheet = None
+    else:
+        print(f"caching {sheet_name} to {cache_path}...")
+        sheet = _clean_cols(pd.read_excel(excel_file_path, sheet_name=sheet_name))
+        cached_cols = list(sheet.columns)
+
+    missing_normalized = [col for col in normalize_cols if _normalized_name(col) not in cached_cols]
+    if sheet is not None or missing_normalized:
+        if sheet is None:
+            sheet = pd.read_parquet(cache_path)
+            stale = [col for col in sheet.columns if NORMALIZED_SUFFIX in col and not col.endswith(f"_{NORMALIZER_VERSION}")]
+            sheet = sheet.drop(columns=stale)
+        for col in missing_normalized:
+            print(f"normalising {col}...")
+            sheet[_normalized_name(col)] = normalize_text(sheet[col], n_jobs=n_jobs)
+        _write_cache(sheet, cache_path)
+
+    read_names = [_normalized_name(col) if col in normalize_cols else col for col in column_names]
+    df = pq.read_table(cache_path, columns=read_names, memory_map=True, filters=filters).to_pandas()
+    df.columns = column_names
+    return df
 
 def read_cols(
     excel_file_path:str, 
     sheet_name:str, 
-    column_names:list
+    column_names:list,
+    normalize_cols:list=None,
+    cache_dir:str=None,
+    n_jobs:int=None,
+    filters=None
 ):
     """
     Reads specified columns from a given Excel sheet and performs initial cleaning by replacing NaN values with 'missing' and
     ensuring all data are of string type. This function is primarily used for preprocessing data read from Excel files.
+    Text columns can also be normalised (HTML entities, Unicode variants, invisible characters and whitespace, see
+    utils.normalize), and the sheet can be cached as Parquet so later reads skip the Excel parsing and the normalisation.
 
     Parameters:
     - excel_file_path (str): Path to the Excel file.
     - sheet_name (str): Name of the sheet to read from.
     - column_names (list): List of column names to read from the sheet.
+    - normalize_cols (list): Columns (among column_names) to return normalised, e.g. ['title', 'description'].
+    - cache_dir (str): Directory for the Parquet cache of the sheet. Reads the Excel file directly if None.
+    - n_jobs (int): Number of threads used for normalisation. Defaults to the number of CPU cores.
+    - filters (pyarrow.compute.Expression): Optional row filter on the (cleaned, un-normalised) columns, e.g. to read only
+      recent comments. With a cache_dir it is pushed down to the Parquet reader.
 
     Returns:
     - pd.DataFrame: A DataFrame containing the specified columns from the Excel sheet, with initial cleaning applied.
     """
 
     print(f"\nreading from {sheet_name}...\n")
-    df = pd.read_excel(
-        excel_file_path,
-        sheet_name=sheet_name,
-        usecols=column_names)
-        
-    # Remove special characters
-    for column_name in column_names:
-        df[column_name] = df[column_name].fillna('missing').astype(str)
-    #     df[column_name] = df[column_name].str.replace(r'[^\x00-\x7F#&;]+', '', regex=True)
+    normalize_cols = normalize_cols or []
+    if cache_dir is not None:
+        df = _read_cached_cols(excel_file_path, sheet_name, column_names, normalize_cols, cache_dir, n_jobs=n_jobs, filters=filters)
+    else:
+        df = _clean_cols(pd.read_excel(
+            excel_file_path,
+            sheet_name=sheet_name,
+            usecols=column_names))
+        if filters is not None:
+            df = pa.Table.from_pandas(df, preserve_index=False).filter(filters).to_pandas()
+        for column_name in normalize_cols:
+            df[column_name] = normalize_text(df[column_name], n_jobs=n_jobs)
 
     # Print the first few entries to verify
     print(f"\n{sheet_name} columns:")
     print(df.columns)
     return df
+
+def read_doc_topics(
+    doc_topic_file_path:str,
+    columns:list=None
+):
+    """
+    Reads the doc-topic Parquet file written by topic_model.py. The file is memory-mapped and only the requested columns are
+    read, so joins can load just the integer 'doc_id' key and the topic columns without the description text.
+
+    Parameters:
+    - doc_topic_file_path (str): Path to the doc-topic Parquet file.
+    - columns (list): Columns to read, e.g. ['doc_id', 'Topic']. Reads all columns if None.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with the requested columns, sorted by doc_id.
+    """
+
+    print(f"\nreading doc topics from {doc_topic_file_path}...\n")
+    return pq.read_table(doc_topic_file_path, columns=columns, memory_map=True).to_pandas()